@@ -0,0 +1,190 @@
+# agent/backends.py: Backends alternativos al modelo real: falso/reproducción sin red y grabación de respuestas.
+import asyncio
+import hashlib
+import json
+import os
+import random
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import Model
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.usage import RequestUsage
+
+# gemini (por defecto) | fake: respuestas sintéticas | replay: respuestas grabadas (sintéticas si
+# no hay grabación) | record: modelo real guardando cada respuesta en LLM_REPLAY_PATH
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH", os.path.join(".cache", "llm_replay.jsonl"))
+# Latencia simulada por petición (media en ms y variación relativa) y fracción de peticiones que fallan
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))
+LLM_FAKE_LATENCY_JITTER = float(os.getenv("LLM_FAKE_LATENCY_JITTER", "0.5"))
+LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))
+LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", "0"))
+
+
+def request_key(messages: list[ModelMessage], info: AgentInfo | None = None) -> str:
+    """
+    Identifica una petición por el prompt del usuario y el tipo de salida esperado.
+    """
+    prompts = [
+        part.content if isinstance(part.content, str) else json.dumps(part.content, default=str)
+        for message in messages if isinstance(message, ModelRequest)
+        for part in message.parts if isinstance(part, UserPromptPart)
+    ]
+    output = ",".join(tool.name for tool in info.output_tools) if info is not None else ""
+    payload = output + "\x00" + "\x00".join(prompts)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def last_prompt(messages: list[ModelMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, ModelRequest):
+            for part in message.parts:
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                    return part.content
+    return ""
+
+
+class ReplayStore:
+    """
+    Respuestas grabadas en un fichero JSONL: una línea {"key", "response"} por petición.
+    """
+    def __init__(self, path: str = LLM_REPLAY_PATH):
+        self.path = path
+        self._responses: dict[str, ModelResponse] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._responses[record["key"]] = ModelMessagesTypeAdapter.validate_python([record["response"]])[0]
+
+    def get(self, key: str) -> ModelResponse | None:
+        return self._responses.get(key)
+
+    def add(self, key: str, response: ModelResponse) -> None:
+        self._responses[key] = response
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        record = {"key": key, "response": ModelMessagesTypeAdapter.dump_python([response], mode="json")[0]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+
+def _fake_value(schema: dict, defs: dict, text: str, seed: int):
+    """
+    Valor sintético y determinista que cumple el esquema JSON de la salida.
+    """
+    if "$ref" in schema:
+        schema = defs.get(schema["$ref"].split("/")[-1], {})
+    if "enum" in schema:
+        return schema["enum"][seed % len(schema["enum"])]
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _fake_value(prop, defs, text, seed) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [_fake_value(schema.get("items", {}), defs, text, seed)]
+    if kind in ("integer", "number"):
+        return seed % 100
+    if kind == "boolean":
+        return seed % 2 == 0
+    return text
+
+
+def fake_response(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    """
+    Respuesta sintética: el principio del texto del prompt como resumen y una categoría
+    elegida de forma determinista a partir del prompt.
+    """
+    prompt = last_prompt(messages)
+    text = prompt.split("Texto:", 1)[-1].split("Fragmento:", 1)[-1].split("\n\n***", 1)[0].strip()[:400]
+    seed = int(request_key(messages)[:8], 16)
+    usage = RequestUsage(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+    if info.output_tools:
+        tool = info.output_tools[0]
+        schema = tool.parameters_json_schema
+        args = _fake_value(schema, schema.get("$defs", {}), text, seed)
+        return ModelResponse(parts=[ToolCallPart(tool.name, args)], usage=usage, model_name="fake")
+    return ModelResponse(parts=[TextPart(text)], usage=usage, model_name="fake")
+
+
+class FakeBackend:
+    """
+    Sustituto local del LLM con latencia y errores configurables. En modo replay responde con
+    lo grabado en LLM_REPLAY_PATH y, si la petición no está grabada, con una respuesta sintética.
+    """
+    def __init__(self, replay: bool):
+        self.store = ReplayStore() if replay else None
+        self.random = random.Random(LLM_FAKE_SEED)
+        self.replayed = 0
+        self.synthesized = 0
+
+    async def respond(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        latency = LLM_FAKE_LATENCY_MS / 1000 * (1 + self.random.uniform(-LLM_FAKE_LATENCY_JITTER, LLM_FAKE_LATENCY_JITTER))
+        await asyncio.sleep(max(0.0, latency))
+        if self.random.random() < LLM_FAKE_ERROR_RATE:
+            raise ModelHTTPError(status_code=503, model_name="fake", body="Error simulado")
+        recorded = self.store.get(request_key(messages, info)) if self.store is not None else None
+        if recorded is not None:
+            self.replayed += 1
+            return recorded
+        self.synthesized += 1
+        return fake_response(messages, info)
+
+
+class RecordingModel(WrapperModel):
+    """
+    Envuelve el modelo real y guarda cada respuesta para reproducirla después con LLM_BACKEND=replay.
+    """
+    def __init__(self, wrapped: Model, store: ReplayStore):
+        super().__init__(wrapped)
+        self.store = store
+
+    async def request(self, messages, model_settings, model_request_parameters) -> ModelResponse:
+        response = await self.wrapped.request(messages, model_settings, model_request_parameters)
+        info = AgentInfo(
+            function_tools=model_request_parameters.function_tools,
+            allow_text_output=model_request_parameters.allow_text_output,
+            output_tools=model_request_parameters.output_tools,
+            model_settings=model_settings,
+        )
+        self.store.add(request_key(messages, info), response)
+        return response
+
+
+_fake_model: FunctionModel | None = None
+_replay_store: ReplayStore | None = None
+
+
+def get_fake_model() -> FunctionModel:
+    """
+    Modelo local compartido para LLM_BACKEND=fake|replay.
+    """
+    global _fake_model
+    if _fake_model is None:
+        backend = FakeBackend(replay=LLM_BACKEND == "replay")
+        _fake_model = FunctionModel(backend.respond, model_name=f"{LLM_BACKEND}-local")
+    return _fake_model
+
+
+def wrap_for_recording(model: Model) -> Model:
+    """
+    Con LLM_BACKEND=record devuelve el modelo envuelto para grabar sus respuestas.
+    """
+    global _replay_store
+    if LLM_BACKEND != "record":
+        return model
+    if _replay_store is None:
+        _replay_store = ReplayStore()
+    return RecordingModel(model, _replay_store)
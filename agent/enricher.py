@@ -0,0 +1,143 @@
+# agent/enricher.py: Una sola llamada a Gemini que resume y clasifica el contenido con salida estructurada.
+import asyncio
+import time
+from enum import Enum
+from dotenv import load_dotenv
+import logfire
+from pydantic import BaseModel, Field
+from pydantic_ai import Agent
+from agent.cache import cache_key, get_cache
+from agent.preprocess import LLM_INPUT_TOKEN_BUDGET, clean_text, estimate_tokens, split_into_chunks, truncate_to_tokens
+from agent.gateway import run_agent
+from agent.registry import CACHE_MODEL_NAME, get_agent
+from metrics import CACHE_LOOKUPS, LLM_CALLS, LLM_TOKENS, stage
+from shared_definitions import Deps
+
+# Configurar clave de API de Gemini
+load_dotenv()
+
+# Cambiar al modificar el prompt o el esquema de salida para no reutilizar resultados antiguos
+PROMPT_VERSION = "enricher-v1"
+
+
+class Category(str, Enum):
+    INVESTIGACION = "investigación"
+    NUEVO_PRODUCTO = "nuevo_producto"
+    POLITICA_REGULACION = "política/regulación"
+    OPINION_ETICA = "opinión/ética"
+    EVENTO_ANUNCIO = "evento/anuncio"
+
+
+CATEGORIES = [category.value for category in Category]
+
+
+class Enrichment(BaseModel):
+    summary: str = Field(description="Resumen del texto en 5 o 6 frases relevantes, sin comentarios adicionales.")
+    category: Category = Field(description="Categoría del texto.")
+
+
+def fallback_enrichment(text: str) -> Enrichment:
+    """
+    Resultado provisional cuando el modelo no responde (o no hay texto): el texto recortado
+    y la primera categoría. Las filas así enriquecidas se marcan como degradadas (agent/reenrich.py).
+    """
+    summary = text[:200] + "..." if len(text) > 200 else text
+    return Enrichment(summary=summary, category=Category(CATEGORIES[0]))
+
+
+def _record_usage(ctx: Deps, result, agent: str) -> None:
+    usage = result.usage()
+    ctx.stats.input_tokens += usage.input_tokens or 0
+    ctx.stats.output_tokens += usage.output_tokens or 0
+    LLM_CALLS.inc(agent=agent, outcome="ok")
+    LLM_TOKENS.inc(usage.input_tokens or 0, agent=agent, kind="input")
+    LLM_TOKENS.inc(usage.output_tokens or 0, agent=agent, kind="output")
+
+
+async def summarize_chunk(chunk: str, ctx: Deps) -> str | None:
+    """
+    Paso "map" de los textos largos: resume un fragmento. Devuelve None si el modelo falla.
+    """
+    try:
+        agente = get_agent("chunk_summarizer", lambda: Agent(output_type=str))
+        with stage("summarize"):
+            result = await run_agent(
+                agente,
+                "chunk_summarizer",
+                "Resume el siguiente fragmento en 3 o 4 frases con los datos más relevantes, "
+                f"sin comentarios adicionales.\n\nFragmento:\n{chunk}",
+                ctx,
+            )
+        _record_usage(ctx, result, "chunk_summarizer")
+        return result.output
+    except Exception as e:
+        LLM_CALLS.inc(agent="chunk_summarizer", outcome="error")
+        print(f"Error al resumir un fragmento: {e}")
+        return None
+
+
+async def enrich(text: str, ctx: Deps) -> Enrichment | None:
+    """
+    Usa el modelo Gemini para resumir el texto y clasificarlo en una categoría predefinida
+    en una única petición. El texto se limpia antes (HTML, espacios); si supera
+    LLM_INPUT_TOKEN_BUDGET se resume primero por fragmentos y la petición final trabaja
+    sobre esos resúmenes (map-reduce). Devuelve None si el modelo no ha podido responder
+    (ver agent/gateway.py), para que el llamante guarde un resultado provisional.
+    """
+    text = clean_text(text)
+    if not text:
+        return fallback_enrichment(text)
+
+    cache = get_cache()
+    key = cache_key(text, PROMPT_VERSION, CACHE_MODEL_NAME)
+    cached = cache.get(key)
+    CACHE_LOOKUPS.inc(cache="llm", result="miss" if cached is None else "hit")
+    if cached is not None:
+        return Enrichment.model_validate(cached)
+
+    started = time.perf_counter()
+    estimated = estimate_tokens(text)
+    ctx.stats.estimated_tokens += estimated
+    LLM_TOKENS.inc(estimated, agent="enricher", kind="estimated")
+    chunks = 1
+    if estimated > LLM_INPUT_TOKEN_BUDGET:
+        parts = split_into_chunks(text, LLM_INPUT_TOKEN_BUDGET)
+        chunks = len(parts)
+        ctx.stats.chunked += 1
+        summaries = await asyncio.gather(*(summarize_chunk(part, ctx) for part in parts))
+        if None in summaries:
+            return None
+        prompt_text = truncate_to_tokens("\n\n".join(summaries), LLM_INPUT_TOKEN_BUDGET)
+    else:
+        prompt_text = text
+
+    prompt = (
+        "Resume el siguiente texto en 5 o 6 frases relevantes y clasifícalo en una de las categorías: "
+        f"{', '.join(CATEGORIES)}.\n\n"
+        f"Texto:\n{prompt_text}\n\n"
+        "***Importante: En caso de recibir un titular, generar descripión extensa.***\n"
+        "***Importante: Devulve el resumen sin comentarios adiconales.***\n"
+    )
+
+    try:
+        agente = get_agent("enricher", lambda: Agent(output_type=Enrichment))
+        # Una sola llamada resume y clasifica
+        with stage("enrich", chunks=chunks):
+            result = await run_agent(agente, "enricher", prompt, ctx)
+        _record_usage(ctx, result, "enricher")
+        usage = result.usage()
+        # Registro por artículo para seguir coste y latencia
+        logfire.info(
+            "enrich {estimated_tokens} tokens estimados",
+            estimated_tokens=estimated,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            chunks=chunks,
+            duration=time.perf_counter() - started,
+        )
+        cache.set(key, result.output.model_dump(mode="json"))
+        return result.output
+    except Exception as e:
+        LLM_CALLS.inc(agent="enricher", outcome="error")
+        print(f"Error en enricher: {e}")
+        return None
@@ -0,0 +1,192 @@
+# agent/gateway.py: Capa común de llamadas al LLM: timeout, reintentos, circuit breaker y modelo de respaldo.
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+from email.utils import parsedate_to_datetime
+import httpx
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from agent.registry import FALLBACK_MODEL_NAME, MODEL_NAME, get_model, get_rate_limiter
+from metrics import LLM_CALLS
+from shared_definitions import Deps
+
+# Segundos como máximo por llamada (cada intento)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Reintentos por modelo ante 429/5xx, timeouts o errores de red, con espera exponencial
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
+# Fallos seguidos que abren el circuito de un modelo y segundos que permanece abierto
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+_RETRY_DELAY_RE = re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s")
+
+
+class LLMUnavailable(Exception):
+    """
+    Ningún modelo ha podido responder (errores, timeouts o circuitos abiertos).
+    """
+
+
+class CircuitBreaker:
+    """
+    Tras `threshold` llamadas fallidas seguidas deja de llamar al modelo durante `cooldown`
+    segundos (abierto). Pasado ese tiempo deja pasar una llamada de prueba (semiabierto):
+    si acierta se cierra y si falla vuelve a abrirse.
+    """
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, cooldown: float = LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> str | None:
+        """
+        Devuelve "call" si el circuito está cerrado, "probe" si esta llamada es la de prueba
+        (semiabierto) y None si no debe llamarse al modelo. Solo la llamada de prueba libera
+        la prueba al terminar (record_success, record_failure o release con probe=True).
+        """
+        state = self.state
+        if state == "closed":
+            return "call"
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return "probe"
+        return None
+
+    def record_success(self, probe: bool = False) -> None:
+        self.failures = 0
+        self.opened_at = None
+        if probe:
+            self._probing = False
+
+    def record_failure(self, probe: bool = False) -> None:
+        self.failures += 1
+        if probe or self.failures >= self.threshold:
+            if self.opened_at is None or probe:
+                print(f"Circuito del LLM abierto durante {self.cooldown:.0f} s tras {self.failures} fallos")
+            self.opened_at = time.monotonic()
+        if probe:
+            self._probing = False
+
+    def release(self, probe: bool = False) -> None:
+        """
+        Libera la llamada de prueba que termina sin veredicto (error no transitorio o
+        cancelación), para que la siguiente pueda volver a probar. Las llamadas admitidas con
+        el circuito cerrado no la tocan aunque terminen con el circuito ya semiabierto.
+        """
+        if probe:
+            self._probing = False
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model_name: str) -> CircuitBreaker:
+    if model_name not in _breakers:
+        _breakers[model_name] = CircuitBreaker()
+    return _breakers[model_name]
+
+
+def error_status(error: Exception) -> int | None:
+    """
+    Código HTTP del error del proveedor (pydantic-ai o google-genai), si lo tiene.
+    """
+    if isinstance(error, ModelHTTPError):
+        return error.status_code
+    # google-genai se importa al crear el modelo real; si no está cargado, el error no es suyo
+    errors = sys.modules.get("google.genai.errors")
+    if errors is not None and isinstance(error, errors.APIError):
+        return error.code
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, httpx.TransportError)):
+        return True
+    return error_status(error) in RETRY_STATUS_CODES
+
+
+def retry_after(error: Exception) -> float | None:
+    """
+    Espera indicada por el proveedor: cabecera Retry-After (segundos o fecha) o el
+    `retryDelay` que Gemini incluye en el cuerpo de los 429.
+    """
+    response = getattr(error, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    body = getattr(error, "body", None) or getattr(error, "details", None)
+    match = _RETRY_DELAY_RE.search(str(body)) if body else None
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, error: Exception) -> float:
+    delay = retry_after(error)
+    if delay is None:
+        delay = LLM_RETRY_BASE_DELAY * 2 ** attempt * random.uniform(0.5, 1.5)
+    return min(delay, LLM_RETRY_MAX_DELAY)
+
+
+async def run_agent(agent: Agent, name: str, prompt: str, ctx: Deps):
+    """
+    Ejecuta el agente con el modelo principal y, si falla, con el de respaldo
+    (LLM_FALLBACK_MODEL). Cada intento tiene LLM_TIMEOUT segundos; los errores transitorios
+    se reintentan respetando Retry-After. Con el circuito de un modelo abierto se salta sin
+    esperar. Los errores no transitorios (p. ej. 400) se propagan tal cual; si ningún modelo
+    responde lanza LLMUnavailable.
+    """
+    models = [MODEL_NAME] + ([FALLBACK_MODEL_NAME] if FALLBACK_MODEL_NAME else [])
+    last_error: Exception | None = None
+    for model_name in models:
+        breaker = get_breaker(model_name)
+        admitted = breaker.allow()
+        if admitted is None:
+            LLM_CALLS.inc(agent=name, outcome="circuit_open")
+            continue
+        probe = admitted == "probe"
+        if model_name != MODEL_NAME:
+            LLM_CALLS.inc(agent=name, outcome="fallback")
+            print(f"Usando el modelo de respaldo {model_name}")
+        try:
+            for attempt in range(LLM_RETRIES + 1):
+                try:
+                    await get_rate_limiter().wait()
+                    async with asyncio.timeout(LLM_TIMEOUT):
+                        result = await agent.run(prompt, deps=ctx, model=get_model(model_name))
+                    breaker.record_success(probe)
+                    return result
+                except Exception as e:
+                    if not is_retryable(e):
+                        # Error de la petición (no del proveedor): no cuenta para el circuito
+                        raise
+                    last_error = e
+                    if attempt == LLM_RETRIES:
+                        break
+                    delay = backoff_delay(attempt, e)
+                    LLM_CALLS.inc(agent=name, outcome="retry")
+                    print(f"LLM {model_name} no disponible ({error_status(e) or type(e).__name__}), reintento en {delay:.1f} s")
+                    await asyncio.sleep(delay)
+            breaker.record_failure(probe)
+        finally:
+            # En cualquier salida (también errores no transitorios y cancelaciones)
+            breaker.release(probe)
+    raise LLMUnavailable(f"Ningún modelo disponible: {last_error or 'circuito abierto'}")
@@ -0,0 +1,134 @@
+# agent/pipeline.py: Etapa compartida de enriquecimiento (resumen + clasificación) con concurrencia acotada.
+import asyncio
+import os
+from typing import Callable
+from agent.cache import get_cache
+from agent.enricher import enrich, fallback_enrichment
+from agent.preprocess import clean_text
+from db.near_duplicates import NEAR_DUP_ENABLED, get_near_duplicate_index, signature
+from db.reenrich_queue import get_reenrich_queue
+from response_cache import invalidate_responses
+from shared_definitions import Deps, known_articles, normalize_title
+
+# Número de artículos que se enriquecen a la vez, entre todas las fuentes del proceso
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "4"))
+
+_enrich_slots: asyncio.Semaphore | None = None
+
+
+def get_enrich_slots() -> asyncio.Semaphore:
+    """
+    Semáforo compartido por todas las ingestas en curso, para que varias fuentes
+    actualizándose a la vez no multipliquen las llamadas simultáneas al LLM.
+    """
+    global _enrich_slots
+    if _enrich_slots is None:
+        _enrich_slots = asyncio.Semaphore(max(1, ENRICH_WORKERS))
+    return _enrich_slots
+
+async def drop_known_items(items: list[dict], ctx: Deps) -> list[dict]:
+    """
+    Descarta, antes de gastar llamadas al LLM, los artículos que ya están almacenados
+    (por fuente y título normalizado, o por URL) y los repetidos dentro del propio lote.
+    """
+    ctx.stats.fetched += len(items)
+    if not items:
+        return []
+    known_titles, known_urls = await known_articles(items)
+    new_items = []
+    for item in items:
+        key = (item.get("source", ""), normalize_title(item.get("title", "")))
+        url = item.get("url")
+        if key in known_titles or (url and url in known_urls):
+            continue
+        known_titles.add(key)
+        if url:
+            known_urls.add(url)
+        new_items.append(item)
+    skipped = len(items) - len(new_items)
+    ctx.stats.skipped_duplicates += skipped
+    print(f"Descartados {skipped} duplicados antes del enriquecimiento")
+    if NEAR_DUP_ENABLED and new_items:
+        kept = await asyncio.to_thread(drop_near_duplicates, new_items, ctx)
+        if len(kept) < len(new_items):
+            # Los grupos ('cluster') de los originales han cambiado en los listados en caché
+            await invalidate_responses()
+        new_items = kept
+    return new_items
+
+def drop_near_duplicates(items: list[dict], ctx: Deps) -> list[dict]:
+    """
+    Descarta los artículos que copian casi literalmente una noticia de otra fuente ya almacenada
+    o aceptada en una ingesta en curso (p. ej. el mismo teletipo en dos medios). El descartado
+    queda registrado en el grupo del original ('cluster' en los listados) en lugar de enriquecerse
+    y guardarse de nuevo. Se compara solo el título: es lo único que también tienen los
+    artículos almacenados (ver SIGNATURE_VERSION en db/near_duplicates.py).
+    Se ejecuta en un hilo: la firma MinHash es cálculo puro.
+    """
+    index = get_near_duplicate_index()
+    kept = []
+    for item in items:
+        key = (item.get("source", ""), item.get("title", ""))
+        blob = signature(key[1])
+        if blob is None:
+            kept.append(item)
+            continue
+        match = index.find(blob, source=key[0])
+        if match is not None:
+            original, score = match
+            index.add_member(item, original, score)
+            ctx.stats.near_duplicates += 1
+            print(f"Casi-duplicado ({score:.2f}) de {original[0]}: {key[1][:50]}")
+            continue
+        index.add_pending(*key, item.get("url"), blob)
+        kept.append(item)
+    return kept
+
+async def enrich_item(item: dict, ctx: Deps) -> dict:
+    """
+    Resume y clasifica un artículo con una única llamada al LLM. `item` debe traer el texto
+    a procesar en 'text'; se devuelve la fila lista para insertar, con 'summary' y 'category'.
+    Si el LLM no responde, la fila lleva un resumen provisional y 'degraded' a True, y el
+    texto queda en la cola de re-enriquecimiento (agent/reenrich.py).
+    """
+    text = item.get("text", "")
+    row = {key: value for key, value in item.items() if key != "text"}
+    row["degraded"] = False
+    if not text:
+        row["summary"] = ""
+        row["category"] = ""
+        return row
+    result = await enrich(text, ctx)
+    if result is None:
+        result = fallback_enrichment(clean_text(text))
+        row["degraded"] = True
+        ctx.stats.degraded += 1
+        get_reenrich_queue().add(row.get("source", ""), row.get("title", ""), text)
+    row["summary"] = result.summary
+    row["category"] = result.category.value
+    return row
+
+async def enrich_items(items: list[dict], ctx: Deps, workers: int | None = None,
+                       on_row: Callable[[dict], None] | None = None) -> list[dict]:
+    """
+    Enriquece todos los artículos con como mucho `workers` artículos en vuelo a la vez
+    (por defecto, los ENRICH_WORKERS compartidos por todo el proceso).
+    El orden de salida coincide con el de entrada; `on_row` recibe cada fila en cuanto está lista.
+    """
+    semaphore = get_enrich_slots() if workers is None else asyncio.Semaphore(max(1, workers))
+
+    async def worker(item: dict) -> dict:
+        async with semaphore:
+            print(f"Procesando: {item.get('title', '')[:50]}...")
+            row = await enrich_item(item, ctx)
+            # Contador por artículo para que el progreso del trabajo avance en vivo
+            ctx.stats.enriched += 1
+            if on_row is not None:
+                on_row(row)
+            return row
+
+    rows = await asyncio.gather(*(worker(item) for item in items))
+    print(f"Caché LLM: {get_cache().stats()}")
+    print(f"Tokens: {ctx.stats.estimated_tokens} estimados, {ctx.stats.input_tokens} de entrada, "
+          f"{ctx.stats.output_tokens} de salida")
+    return rows
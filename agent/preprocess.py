@@ -0,0 +1,81 @@
+# agent/preprocess.py: Limpieza del texto antes del LLM (HTML, espacios) y estimación local de tokens.
+import html
+import math
+import os
+import re
+
+# Presupuesto de tokens de entrada por llamada; por encima se resume por fragmentos (map-reduce)
+LLM_INPUT_TOKEN_BUDGET = int(os.getenv("LLM_INPUT_TOKEN_BUDGET", "2000"))
+# Fragmentos como máximo por texto largo; lo que exceda se descarta
+LLM_MAX_CHUNKS = int(os.getenv("LLM_MAX_CHUNKS", "8"))
+# Estimación de caracteres por token (aproximación habitual para Gemini en texto latino)
+CHARS_PER_TOKEN = 4
+
+_DROP_BLOCKS_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]+>")
+_WHITESPACE_RE = re.compile(r"\s+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def strip_html(text: str) -> str:
+    """
+    Elimina etiquetas HTML (y el contenido de script/style) y decodifica las entidades.
+    """
+    if "<" in text:
+        text = _DROP_BLOCKS_RE.sub(" ", text)
+        text = _TAG_RE.sub(" ", text)
+    return html.unescape(text) if "&" in text else text
+
+
+def clean_text(text: str) -> str:
+    """
+    Texto listo para el prompt: sin HTML y con los espacios colapsados.
+    """
+    return _WHITESPACE_RE.sub(" ", strip_html(text)).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación rápida (sin tokenizador) del número de tokens del texto.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """
+    Recorta el texto al presupuesto de tokens estimado, sin partir la última palabra.
+    """
+    limit = budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit]
+
+
+def split_into_chunks(text: str, budget: int, max_chunks: int = LLM_MAX_CHUNKS) -> list[str]:
+    """
+    Divide el texto en fragmentos de como mucho `budget` tokens estimados, cortando por
+    frases cuando es posible. Devuelve como mucho `max_chunks` fragmentos.
+    """
+    chunks: list[str] = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        while estimate_tokens(sentence) > budget:
+            # Frase más larga que un fragmento: se corta por palabras
+            head = truncate_to_tokens(sentence, budget)
+            sentence = sentence[len(head):].lstrip()
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(head)
+        candidate = f"{current} {sentence}" if current else sentence
+        if estimate_tokens(candidate) > budget:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+        if len(chunks) >= max_chunks:
+            return chunks[:max_chunks]
+    if current:
+        chunks.append(current)
+    return chunks[:max_chunks]
@@ -0,0 +1,51 @@
+# agent/reenrich.py: Trabajo que vuelve a enriquecer los artículos guardados con un resumen provisional (LLM caído).
+import asyncio
+import os
+from agent.enricher import enrich
+from agent.pipeline import get_enrich_slots
+from db.reenrich_queue import get_reenrich_queue
+from db.search import mirror_articles
+from db.storage import get_store
+from response_cache import invalidate_responses
+from shared_definitions import Deps
+
+# Artículos que se intentan por ejecución del trabajo
+REENRICH_BATCH_SIZE = int(os.getenv("REENRICH_BATCH_SIZE", "50"))
+# Nombre del trabajo en la cola (JobManager) y en el [schedule] de sources.toml
+REENRICH_JOB = "reenrich"
+
+
+async def reenrich_degraded(ctx: Deps) -> int:
+    """
+    Vuelve a resumir y clasificar los artículos degradados más antiguos (REENRICH_BATCH_SIZE)
+    y actualiza sus filas. Devuelve cuántos artículos se han actualizado.
+    """
+    queue = get_reenrich_queue()
+    pending = queue.take(REENRICH_BATCH_SIZE)
+    ctx.stats.fetched += len(pending)
+    semaphore = get_enrich_slots()
+
+    async def reenrich(item: dict) -> list[dict] | None:
+        async with semaphore:
+            result = await enrich(item["text"], ctx)
+        if result is None:
+            queue.failed(item["source"], item["title"])
+            return None
+        ctx.stats.enriched += 1
+        rows = await get_store().update_enrichment(item["source"], item["title"], result.summary, result.category.value)
+        queue.remove(item["source"], item["title"])
+        return rows
+
+    # El primero va solo: si el LLM sigue sin responder (o con el circuito abierto) no se gastan
+    # intentos del resto, que esperan a la siguiente ejecución
+    first = await reenrich(pending[0]) if pending else None
+    updated = list(first or [])
+    if first is not None:
+        for rows in await asyncio.gather(*(reenrich(item) for item in pending[1:])):
+            updated.extend(rows or [])
+    ctx.stats.inserted += len(updated)
+    if updated:
+        mirror_articles(updated)
+        await invalidate_responses()
+    print(f"✓ Re-enriquecidos {len(updated)} de {len(pending)} artículos degradados ({len(queue)} pendientes)")
+    return len(updated)
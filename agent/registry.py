@@ -0,0 +1,99 @@
+# agent/registry.py: Registro de agentes y modelos reutilizables entre llamadas.
+import os
+from typing import Callable
+from httpx import AsyncHTTPTransport, Limits
+from pydantic_ai import Agent
+from pydantic_ai.models import Model
+from agent.backends import LLM_BACKEND, get_fake_model, wrap_for_recording
+from shared_definitions import RateLimiter
+
+PROVIDER = "google-gla"
+MODEL_NAME = "gemini-2.5-flash-lite"
+# Modelo de respaldo (mismo proveedor) cuando el principal falla o tiene el circuito abierto (agent/gateway.py)
+FALLBACK_MODEL_NAME = os.getenv("LLM_FALLBACK_MODEL", "")
+# Las respuestas de los backends locales (agent/backends.py) no se mezclan en la caché con las reales
+CACHE_MODEL_NAME = MODEL_NAME if LLM_BACKEND in ("gemini", "record") else f"{LLM_BACKEND}:{MODEL_NAME}"
+# Peticiones por minuto permitidas hacia cada proveedor de LLM
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+# Pool de conexiones propio de google-genai (los mismos límites por defecto que el de la aplicación)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+
+_agents: dict[str, Agent] = {}
+_models: dict[str, Model] = {}
+# Transporte que comparten todos los modelos de Gemini; se cierra con close_models
+_transport: AsyncHTTPTransport | None = None
+_rate_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(provider: str = PROVIDER) -> RateLimiter:
+    """
+    Devuelve el limitador compartido del proveedor indicado, creándolo la primera vez.
+    """
+    if provider not in _rate_limiters:
+        interval = 60 / LLM_REQUESTS_PER_MINUTE if LLM_REQUESTS_PER_MINUTE > 0 else 0
+        _rate_limiters[provider] = RateLimiter(interval)
+    return _rate_limiters[provider]
+
+
+def get_agent(name: str, factory: Callable[[], Agent]) -> Agent:
+    """
+    Devuelve el agente registrado con `name`, construyéndolo con `factory` solo la primera vez.
+    Los agentes se crean sin modelo; el modelo se pasa en cada `run` mediante `get_model`.
+    """
+    agent = _agents.get(name)
+    if agent is None:
+        agent = _agents[name] = factory()
+    return agent
+
+
+def _get_transport() -> AsyncHTTPTransport:
+    """
+    Transporte HTTP de google-genai, separado del cliente de la aplicación: google-genai cierra
+    el transporte al cerrar su cliente, y la instrumentación del cliente de la aplicación
+    (HTTPX_CAPTURE) no debe registrar los prompts ni las respuestas del modelo.
+    """
+    global _transport
+    if _transport is None:
+        _transport = AsyncHTTPTransport(limits=Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        ))
+    return _transport
+
+
+def _build_model(model_name: str) -> Model:
+    # Diferido: google-genai tarda más en importarse que el resto de la aplicación junta
+    from google.genai import Client as GenAIClient
+    from pydantic_ai.models.google import GoogleModel
+    from pydantic_ai.providers.google import GoogleProvider
+
+    api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+    # Reutilizar las conexiones (keep-alive) entre llamadas y entre modelos
+    http_options = {"async_client_args": {"transport": _get_transport()}}
+    genai_client = GenAIClient(api_key=api_key, http_options=http_options)  # type: ignore
+    return wrap_for_recording(GoogleModel(model_name, provider=GoogleProvider(client=genai_client)))
+
+
+def get_model(model_name: str = MODEL_NAME) -> Model:
+    """
+    Devuelve el modelo de Gemini indicado, creándolo una sola vez.
+    Con LLM_BACKEND=fake|replay devuelve el modelo local, que no usa la red.
+    """
+    if LLM_BACKEND in ("fake", "replay"):
+        return get_fake_model()
+    model = _models.get(model_name)
+    if model is None:
+        model = _models[model_name] = _build_model(model_name)
+    return model
+
+
+async def close_models() -> None:
+    """
+    Cierra las conexiones de los modelos de Gemini; get_model los vuelve a crear si hace falta.
+    """
+    global _transport
+    _models.clear()
+    if _transport is not None:
+        await _transport.aclose()
+        _transport = None
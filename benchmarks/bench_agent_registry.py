@@ -0,0 +1,52 @@
+# benchmarks/bench_agent_registry.py: Mide el coste por llamada de construir el agente frente a reutilizarlo.
+# Uso: uv run benchmarks/bench_agent_registry.py [iteraciones]
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import time
+from httpx import AsyncClient
+from pydantic_ai import Agent
+
+# Solo se construyen objetos; no se hace ninguna petición real a Gemini
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from agent.enricher import Enrichment
+from agent.registry import get_agent, get_model
+
+
+def per_call_construction(client: AsyncClient) -> None:
+    # Comportamiento anterior: un Agent (y su proveedor/cliente HTTP) nuevo en cada llamada
+    Agent('google-gla:gemini-2.5-flash-lite', output_type=Enrichment)
+
+
+def registry_lookup(client: AsyncClient) -> None:
+    get_agent("enricher", lambda: Agent(output_type=Enrichment))
+    get_model()
+
+
+def measure(fn, client: AsyncClient, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(client)
+    return (time.perf_counter() - start) / iterations
+
+
+async def main(iterations: int):
+    async with AsyncClient() as client:
+        before = measure(per_call_construction, client, iterations)
+        # La primera llamada al registro construye el agente y el modelo; el resto los reutiliza
+        first = measure(registry_lookup, client, 1)
+        after = measure(registry_lookup, client, iterations)
+    print(f"Iteraciones: {iterations}")
+    print(f"Antes (Agent por llamada):   {before * 1e6:10.1f} µs/llamada")
+    print(f"Registro, primera llamada:   {first * 1e6:10.1f} µs")
+    print(f"Después (registro):          {after * 1e6:10.1f} µs/llamada")
+    print(f"Mejora: x{before / after:.0f}")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    asyncio.run(main(iterations))
@@ -0,0 +1,347 @@
+# benchmarks/bench_end_to_end.py: Benchmark de extremo a extremo de la ingesta (scrapers) y del servicio de páginas.
+# Usa los feeds grabados de benchmarks/fixtures, el LLM local (LLM_BACKEND=fake) y SQLite en memoria:
+# no hace ninguna petición de red.
+# Uso: uv run benchmarks/bench_end_to_end.py [--rows 1000,10000,100000] [--requests 50]
+#                                            [--arxiv-papers 300] [--json resultados.json]
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+os.chdir(ROOT)
+
+# Backends locales; se pueden sobrescribir desde el entorno (p. ej. LLM_FAKE_LATENCY_MS=0)
+for name, value in {
+    "STORAGE_BACKEND": "sqlite",
+    "SQLITE_DB_PATH": ":memory:",
+    "SEARCH_INDEX_PATH": ":memory:",
+    "LLM_BACKEND": "fake",
+    "LLM_FAKE_LATENCY_MS": "50",
+    "LLM_CACHE_PATH": ":memory:",
+    "FEED_CACHE_PATH": ":memory:",
+    "NEAR_DUP_ENABLED": "1",
+    "NEAR_DUP_INDEX_PATH": ":memory:",
+    "REENRICH_QUEUE_PATH": ":memory:",
+    "LLM_REQUESTS_PER_MINUTE": "0",
+    "ARXIV_REQUEST_DELAY": "0",
+    "ARXIV_MAX_RESULTS": "100000",
+    "GOOGLE_API_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from urllib.parse import parse_qs
+import httpx
+import agent.cache
+import agent.pipeline
+import db.near_duplicates
+import db.search
+import db.storage
+import scraper.feed_cache
+import scraper.sources
+from agent.registry import get_model
+from response_cache import invalidate_responses
+from scraper.arxiv_scraper import scrape_arxiv
+from scraper.news_scraper import scrape_news
+from scraper.sources import get_sources
+from scraper.youtube_scraper import scrape_youtube
+from shared_definitions import Deps
+import main
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+SCRAPERS = {"news": scrape_news, "arxiv": scrape_arxiv, "youtube": scrape_youtube}
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def latency_summary(seconds: list[float]) -> dict:
+    return {
+        "count": len(seconds),
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 3),
+    }
+
+
+class Probe:
+    """
+    Tiempos por etapa y viajes de ida y vuelta (HTTP, LLM, base de datos) durante una ejecución.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.stages: dict[str, list[float]] = defaultdict(list)
+        self.round_trips = {"http": 0, "llm": 0, "db": 0}
+
+    def timed(self, stage: str, fn):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.stages[stage].append(time.perf_counter() - started)
+        return wrapper
+
+    def counted(self, kind: str, fn):
+        async def wrapper(*args, **kwargs):
+            self.round_trips[kind] += 1
+            return await fn(*args, **kwargs)
+        return wrapper
+
+
+probe = Probe()
+
+
+def expand_entries(feed: str, tag: str, copies: int) -> str:
+    """
+    Repite las entradas del feed grabado con títulos, ids y enlaces únicos para llegar a `copies` entradas.
+    Cada copia empieza su resumen con palabras propias para que la detección de casi-duplicados
+    no la descarte como la misma noticia.
+    """
+    blocks = re.findall(rf"<{tag}>.*?</{tag}>", feed, re.DOTALL)
+    head = feed[:feed.index(blocks[0])]
+    tail = feed[feed.rindex(blocks[-1]) + len(blocks[-1]):]
+    entries = []
+    for n in range(copies):
+        block = blocks[n % len(blocks)]
+        suffix = f"-{n}"
+        block = re.sub(r"</title>", f" ({n})</title>", block)
+        lead = " ".join(f"tema{n}x{j}" for j in range(40))
+        block = re.sub(r"<summary>", f"<summary>{lead} ", block)
+        block = re.sub(r"</id>", f"{suffix}</id>", block)
+        block = re.sub(r"</guid>", f"{suffix}</guid>", block)
+        block = re.sub(r'(<link[^>]*href=")([^"]+)"', rf'\1\2{suffix}"', block)
+        block = re.sub(r"<link>([^<]+)</link>", rf"<link>\1{suffix}</link>", block)
+        entries.append(block)
+    return head + "\n".join(entries) + tail
+
+
+class FixtureServer:
+    """
+    Transporte HTTP que responde con los feeds grabados según el host.
+    """
+    def __init__(self, arxiv_papers: int):
+        self.techcrunch = read_fixture("techcrunch.xml")
+        self.theverge = read_fixture("theverge.xml")
+        self.youtube = read_fixture("youtube.html")
+        arxiv = read_fixture("arxiv.xml")
+        self.arxiv_entries = re.findall(r"<entry>.*?</entry>", expand_entries(arxiv, "entry", arxiv_papers), re.DOTALL)
+        self.arxiv_head = arxiv[:arxiv.index("<entry>")]
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        probe.round_trips["http"] += 1
+        host = request.url.host
+        if "techcrunch" in host:
+            return httpx.Response(200, text=self.techcrunch)
+        if "theverge" in host:
+            return httpx.Response(200, text=self.theverge)
+        if "youtube" in host:
+            return httpx.Response(200, text=self.youtube)
+        if "arxiv" in host:
+            query = parse_qs(request.url.query.decode())
+            start, count = int(query["start"][0]), int(query["max_results"][0])
+            page = self.arxiv_entries[start:start + count]
+            return httpx.Response(200, text=self.arxiv_head + "\n".join(page) + "</feed>\n")
+        return httpx.Response(404)
+
+
+def reset_state() -> None:
+    """
+    Base de datos, réplica de búsqueda, caché del LLM y estado de los feeds vacíos, como en
+    una primera ejecución.
+    """
+    db.storage._store = None
+    db.search._index = None
+    agent.cache._cache = None
+    scraper.feed_cache._cache = None
+    db.near_duplicates._index = None
+    store = db.storage.get_store()
+    for method in ("has_articles", "find_articles", "insert_articles", "list_articles"):
+        setattr(store, method, probe.counted("db", getattr(store, method)))
+
+
+def instrument() -> None:
+    scraper.sources.drop_known_items = probe.timed("dedupe", scraper.sources.drop_known_items)
+    agent.pipeline.enrich_item = probe.timed("enrich_item", agent.pipeline.enrich_item)
+    scraper.sources.upload_rows = probe.timed("upload_batch", scraper.sources.upload_rows)
+    for source in get_sources().values():
+        source.collect = probe.timed("collect", source.collect)
+    model = get_model()
+    model.function = probe.counted("llm", model.function)
+
+
+async def bench_ingest(server: FixtureServer) -> dict:
+    results = {}
+    transport = httpx.MockTransport(server.handle)
+    for name, scrape in [*SCRAPERS.items(), ("all", None)]:
+        reset_state()
+        probe.reset()
+        async with httpx.AsyncClient(transport=transport) as client:
+            deps = Deps(client=client)
+            started = time.perf_counter()
+            if scrape is None:
+                # Como /update/all: todas las fuentes a la vez compartiendo los límites del proceso
+                await asyncio.gather(*(fn(deps) for fn in SCRAPERS.values()))
+            else:
+                await scrape(deps)
+            elapsed = time.perf_counter() - started
+        fetched = deps.stats.fetched
+        total_trips = sum(probe.round_trips.values())
+        results[name] = {
+            "items": fetched,
+            "inserted": deps.stats.inserted,
+            "seconds": round(elapsed, 4),
+            "items_per_sec": round(fetched / elapsed, 2) if elapsed else 0.0,
+            "round_trips": dict(probe.round_trips),
+            "round_trips_per_item": round(total_trips / fetched, 3) if fetched else None,
+            "stages": {stage: latency_summary(values) for stage, values in probe.stages.items()},
+        }
+    return results
+
+
+SOURCES = ["TechCrunch", "TheVerge", "arXiv", "YouTube", "Blog"]
+CATEGORIES = ["investigación", "nuevo_producto", "política/regulación", "opinión/ética", "evento/anuncio"]
+WORDS = "modelo lenguaje agente robot datos regulación chip visión búsqueda seguridad código audio".split()
+
+
+def populate(rows: int) -> None:
+    """
+    Llena la tabla con `rows` artículos sintéticos repartidos en dos años.
+    """
+    rng = random.Random(rows)
+    today = date.today()
+    data = []
+    for n in range(rows):
+        words = " ".join(rng.choice(WORDS) for _ in range(6))
+        data.append((
+            SOURCES[n % len(SOURCES)],
+            f"Artículo {n}: {words}",
+            f"Resumen del artículo {n} sobre {words}. " * 3,
+            rng.choice(CATEGORIES),
+            f"https://example.com/{n}",
+            (today - timedelta(days=rng.randrange(730))).isoformat(),
+        ))
+    store = db.storage.get_store()
+    with store._lock:
+        store._conn.executemany(
+            "INSERT INTO articles (source, title, summary, category, url, date, title_key)"
+            " VALUES (?, ?, ?, ?, ?, ?, normalize_title(?))",
+            [(*row, row[1]) for row in data],
+        )
+        store._conn.commit()
+
+
+async def bench_serving(row_counts: list[int], requests: int) -> dict:
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for rows in row_counts:
+            reset_state()
+            populate(rows)
+            # Cursor de la página 10 para medir una paginación profunda
+            cursor = None
+            for _ in range(10):
+                cursor = (await client.get("/api/articles", params={"cursor": cursor} if cursor else None)).json()["next_cursor"]
+            endpoints = {
+                "home": ("/", None),
+                "articles": ("/api/articles", None),
+                "articles_page_10": ("/api/articles", {"cursor": cursor}),
+                "articles_filtered": ("/api/articles", {"source": "arXiv", "category": CATEGORIES[0]}),
+                "articles_text": ("/api/articles", {"q": "regulación"}),
+            }
+            results[rows] = {}
+            for endpoint, (path, params) in endpoints.items():
+                results[rows][endpoint] = {}
+                for mode in ("cold", "warm"):
+                    timings = []
+                    started = time.perf_counter()
+                    for _ in range(requests):
+                        if mode == "cold":
+                            # Sin caché de respuestas: cada petición consulta la base de datos
+                            await invalidate_responses()
+                        t0 = time.perf_counter()
+                        response = await client.get(path, params=params)
+                        timings.append(time.perf_counter() - t0)
+                        response.raise_for_status()
+                    elapsed = time.perf_counter() - started
+                    results[rows][endpoint][mode] = {
+                        **latency_summary(timings),
+                        "requests_per_sec": round(requests / elapsed, 1),
+                    }
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(report: dict) -> None:
+    print("\n== Ingesta ==")
+    for name, result in report["ingest"].items():
+        print(f"{name:8} {result['items']:5} artículos  {result['items_per_sec']:8.1f} art/s  "
+              f"ida y vuelta/art: {result['round_trips_per_item']}  {result['round_trips']}")
+        for stage, summary in result["stages"].items():
+            print(f"         {stage:13} n={summary['count']:<5} p50={summary['p50_ms']:9.2f} ms  p95={summary['p95_ms']:9.2f} ms")
+    print("\n== Servicio de páginas ==")
+    for rows, endpoints in report["serving"].items():
+        print(f"{rows} filas")
+        for endpoint, modes in endpoints.items():
+            cold, warm = modes["cold"], modes["warm"]
+            print(f"  {endpoint:18} sin caché p50={cold['p50_ms']:8.2f} p95={cold['p95_ms']:8.2f} ms "
+                  f"({cold['requests_per_sec']:7.1f} req/s) | con caché p50={warm['p50_ms']:6.2f} ms")
+
+
+async def run(args) -> dict:
+    instrument()
+    server = FixtureServer(args.arxiv_papers)
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "arxiv_papers": args.arxiv_papers,
+            "rows": args.rows,
+            "requests": args.requests,
+            "llm_fake_latency_ms": float(os.environ["LLM_FAKE_LATENCY_MS"]),
+            "enrich_workers": agent.pipeline.ENRICH_WORKERS,
+        },
+        "ingest": await bench_ingest(server),
+        "serving": await bench_serving(args.rows, args.requests),
+    }
+    await db.storage.close_store()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta y servicio de páginas")
+    parser.add_argument("--rows", type=lambda value: [int(n) for n in value.split(",")], default=[1000, 10000, 100000])
+    parser.add_argument("--requests", type=int, default=50, help="peticiones por endpoint y modo")
+    parser.add_argument("--arxiv-papers", type=int, default=300, help="papers en el feed de arXiv grabado")
+    parser.add_argument("--json", help="fichero donde guardar los resultados (JSON)")
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.json}")
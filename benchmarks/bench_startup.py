@@ -0,0 +1,109 @@
+# benchmarks/bench_startup.py: Mide el arranque en frío del servidor y de los scrapers frente a un presupuesto de tiempo.
+# Cada medida es un proceso nuevo de Python (sin módulos ya cargados), sin variables de Supabase ni de Gemini.
+# Uso: uv run benchmarks/bench_startup.py [--runs 5] [--budget-ms 1500] [--json resultados.json]
+# Sale con código 1 si la mediana de algún objetivo supera el presupuesto.
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import argparse
+import json
+import statistics
+import subprocess
+import time
+
+# Presupuesto (ms) de cada arranque: importar el módulo y, en el servidor, ejecutar el lifespan
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+IMPORT_TARGETS = ["scraper.news_scraper", "scraper.arxiv_scraper", "scraper.youtube_scraper", "scheduler"]
+# Librerías pesadas que no deben cargarse al arrancar (se importan al usarse)
+DEFERRED_MODULES = ["google.genai", "feedparser", "youtube_search"]
+
+# Se ejecuta en el proceso hijo; imprime una línea JSON con las medidas
+_PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+ready = imported
+if {server}:
+    async def start():
+        async with {module}.app.router.lifespan_context({module}.app):
+            return time.perf_counter()
+    ready = asyncio.run(start())
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "loaded": [name for name in {deferred!r} if name in sys.modules],
+}}))
+"""
+
+# Entorno mínimo: sin credenciales, almacenamiento y cachés locales en memoria
+ENV = {
+    "PATH": os.environ.get("PATH", ""),
+    "HOME": os.environ.get("HOME", ""),
+    "STORAGE_BACKEND": "sqlite",
+    "SQLITE_DB_PATH": ":memory:",
+    "SEARCH_INDEX_PATH": ":memory:",
+    "NEAR_DUP_INDEX_PATH": ":memory:",
+    "LLM_CACHE_PATH": ":memory:",
+    "FEED_CACHE_PATH": ":memory:",
+    "REENRICH_QUEUE_PATH": ":memory:",
+    "LOGFIRE_SEND_TO_LOGFIRE": "false",
+}
+
+
+def measure(module: str, server: bool = False) -> dict:
+    code = _PROBE.format(module=module, server=server, deferred=DEFERRED_MODULES)
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=ENV, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Fallo al arrancar {module}:\n{result.stderr}")
+    return {**json.loads(result.stdout.strip().splitlines()[-1]), "wall_ms": wall_ms}
+
+
+def run(runs: int, budget_ms: float) -> dict:
+    report = {"budget_ms": budget_ms, "runs": runs, "targets": {}}
+    # Intérprete sin nada más, para separar su arranque del de la aplicación
+    baseline = [measure("sys")["wall_ms"] for _ in range(runs)]
+    report["interpreter_ms"] = statistics.median(baseline)
+    targets = [("main", True)] + [(module, False) for module in IMPORT_TARGETS]
+    for module, server in targets:
+        samples = [measure(module, server) for _ in range(runs)]
+        ready = statistics.median(sample["ready_ms"] for sample in samples)
+        report["targets"][module] = {
+            "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+            "ready_ms": ready,
+            "wall_ms": statistics.median(sample["wall_ms"] for sample in samples),
+            "loaded_deferred": samples[-1]["loaded"],
+            "within_budget": ready <= budget_ms,
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"Intérprete: {report['interpreter_ms']:.0f} ms  |  presupuesto: {report['budget_ms']:.0f} ms "
+          f"(mediana de {report['runs']})")
+    for module, result in report["targets"].items():
+        mark = "✓" if result["within_budget"] else "✗"
+        loaded = f"  cargados: {', '.join(result['loaded_deferred'])}" if result["loaded_deferred"] else ""
+        print(f"{mark} {module:24} import {result['import_ms']:7.0f} ms  listo {result['ready_ms']:7.0f} ms  "
+              f"proceso {result['wall_ms']:7.0f} ms{loaded}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del arranque en frío")
+    parser.add_argument("--runs", type=int, default=5, help="procesos por objetivo (se toma la mediana)")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="presupuesto por arranque")
+    parser.add_argument("--json", help="fichero donde guardar los resultados (JSON)")
+    args = parser.parse_args()
+    report = run(args.runs, args.budget_ms)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.json}")
+    sys.exit(0 if all(result["within_budget"] for result in report["targets"].values()) else 1)
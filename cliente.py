@@ -1,3 +1,4 @@
+import time
 import requests
 
 url = "http://localhost:8000/update/all"
@@ -12,3 +13,13 @@ response = requests.post(url, json=data)
 
 print("Status code:", response.status_code)
 print("Response body:", response.text)
+
+# La actualización se ejecuta en segundo plano: consultar los trabajos hasta que terminen
+if response.status_code == 202:
+    for source, job in response.json().get("jobs", {}).items():
+        while True:
+            status = requests.get(f"http://localhost:8000/jobs/{job['job_id']}").json()
+            if status["status"] in ("done", "failed"):
+                print(f"{source}: {status['status']}, progreso: {status['progress']}, error: {status['error']}")
+                break
+            time.sleep(2)
@@ -0,0 +1,55 @@
+# db/articles.py: Consultas de listado de artículos con paginación por cursor (keyset) y filtros en servidor.
+import base64
+import json
+import os
+from db.storage import get_store
+
+ARTICLES_PAGE_SIZE = int(os.getenv("ARTICLES_PAGE_SIZE", "50"))
+ARTICLES_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(row: dict) -> str:
+    """
+    Codifica la posición (date, source, id) de la última fila de una página.
+    """
+    payload = json.dumps([row["date"], row["source"], row["id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str, int]:
+    """
+    Inverso de `encode_cursor`. Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        date, source, article_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(date), str(source), int(article_id)
+    except Exception as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+
+async def fetch_articles_page(
+    cursor: str | None = None,
+    limit: int = ARTICLES_PAGE_SIZE,
+    source: str | None = None,
+    category: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    q: str | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Devuelve una página de artículos ordenados por (date desc, source, id) y el cursor
+    de la siguiente página (None si no hay más). Todos los filtros se aplican en la base de datos.
+    """
+    limit = max(1, min(limit, ARTICLES_MAX_PAGE_SIZE))
+    # Se pide una fila de más para saber si existe una página siguiente
+    rows = await get_store().list_articles(
+        limit + 1,
+        source=source,
+        category=category,
+        date_from=date_from,
+        date_to=date_to,
+        after=decode_cursor(cursor) if cursor else None,
+        q=q,
+    )
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
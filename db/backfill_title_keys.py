@@ -0,0 +1,50 @@
+# db/backfill_title_keys.py: Rellena title_key en las filas de Supabase anteriores a la columna (ver db/schema.sql).
+# Se hace desde Python para usar exactamente la misma normalize_title que known_articles: en SQL,
+# casefold() (ß -> ss) y los espacios Unicode de str.split() (NBSP, etc.) no tienen equivalente exacto.
+# Uso: uv run db/backfill_title_keys.py
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from dotenv import load_dotenv
+from db.storage import normalize_title
+from db.supabase_client import SupabaseClient, close_supabase, get_supabase
+
+load_dotenv()
+
+# Filas sin title_key que se leen (y actualizan a la vez) en cada vuelta
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "200"))
+
+
+async def backfill_title_keys(supabase: SupabaseClient, page_size: int = BACKFILL_PAGE_SIZE) -> int:
+    """
+    Calcula title_key con normalize_title para todas las filas que no lo tienen.
+    Devuelve el número de filas actualizadas.
+    """
+    updated = 0
+    while True:
+        rows = await supabase.select("articles", {"select": "id,title", "title_key": "is.null", "limit": page_size})
+        if not rows:
+            return updated
+
+        async def update(row: dict) -> None:
+            response = await supabase.update("articles", {"id": f"eq.{row['id']}"}, {"title_key": normalize_title(row["title"])})
+            if response.status_code not in (200, 204):
+                raise RuntimeError(f"Supabase respondió {response.status_code}: {response.text}")
+
+        await asyncio.gather(*(update(row) for row in rows))
+        updated += len(rows)
+        print(f"title_key rellenado en {updated} artículos")
+
+
+async def main():
+    try:
+        updated = await backfill_title_keys(get_supabase())
+        print(f"✓ {updated} artículos actualizados")
+    finally:
+        await close_supabase()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,349 @@
+# db/near_duplicates.py: Detección de casi-duplicados entre fuentes (MinHash + LSH en memoria, persistido en SQLite).
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import bisect
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from array import array
+from db.articles import ARTICLES_MAX_PAGE_SIZE, fetch_articles_page
+from db.storage import close_store
+
+# Desactivado por defecto: descarta artículos sin enriquecerlos ni guardarlos
+NEAR_DUP_ENABLED = os.getenv("NEAR_DUP_ENABLED", "0") == "1"
+# Similitud (Jaccard estimada entre títulos) a partir de la cual dos artículos de fuentes distintas
+# son la misma noticia. La misma noticia redactada por dos medios puntúa entre 0.1 y 0.55, igual que
+# dos noticias distintas sobre el mismo producto ("Gemini 2.5 Flash" y "Gemini 2.5 Pro pricing":
+# 0.58); 0.8 solo agrupa copias casi literales (teletipos, notas de prensa: ~0.83)
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_INDEX_PATH = os.getenv("NEAR_DUP_INDEX_PATH", os.path.join(".cache", "near_duplicates.sqlite3"))
+# Firma de 48 permutaciones en 16 bandas de 3: un par con similitud 0.8 comparte alguna banda
+# con probabilidad > 0.999 (0.98 con 0.6); con la similitud típica entre noticias distintas
+# (< 0.05) solo un 0.2 % de los artículos sale como candidato
+MINHASH_PERMUTATIONS = 48
+LSH_BANDS = 16
+# Segundos que un artículo aceptado pero aún sin insertar sigue contando como original
+PENDING_TTL = 3600
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+_WORD_RE = re.compile(r"\w{3,}", re.UNICODE)
+# Palabras vacías (inglés y español, sin acentos) que solo inflan la similitud entre noticias distintas
+_STOPWORDS = frozenset("""
+    the and for with that this from are was were has have had its into about after over their they them
+    will would can could new more than also said says been being what when where which who how not but
+    all any our your you his her she him out one two use using uses via per now just here
+    del las los una por para con que como mas sus ese esta este sobre entre sin segun tras ante desde
+""".split())
+# Entradas de las bandas: hash de la banda en los bits altos y posición del artículo en los bajos
+_POSITION_BITS = 24
+_HASH_MASK = (1 << (64 - _POSITION_BITS)) - 1
+
+
+# Versión de la firma guardada en el fichero (PRAGMA user_version). Las firmas solo dependen del
+# título, el único campo que existe tanto antes del enriquecimiento como en los artículos guardados
+# (el texto original no se guarda y el resumen aún no existe); las de versiones anteriores se rehacen
+SIGNATURE_VERSION = 2
+
+
+def shingles(title: str) -> set[int]:
+    """
+    Palabras (de 3 o más letras, sin acentos, mayúsculas ni palabras vacías) del título,
+    como hashes de 32 bits estables entre procesos.
+    """
+    normalized = unicodedata.normalize("NFKD", title.casefold())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    return {
+        zlib.crc32(word.encode("utf-8"))
+        for word in _WORD_RE.findall(normalized) if word not in _STOPWORDS
+    }
+
+
+def signature(title: str) -> bytes | None:
+    """
+    Firma MinHash del título (un entero de 32 bits por permutación), o None si no tiene
+    palabras suficientes para compararlo.
+    """
+    hashes = shingles(title)
+    if len(hashes) < 3:
+        return None
+    return array("I", (min((a * h + b) % _PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS)).tobytes()
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """
+    Jaccard estimada: fracción de permutaciones en las que coinciden los mínimos.
+    """
+    a, b = array("I", first), array("I", second)
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _band_hashes(blob: bytes) -> list[int]:
+    size = len(blob) // LSH_BANDS
+    return [hash(blob[band * size:(band + 1) * size]) & _HASH_MASK for band in range(LSH_BANDS)]
+
+
+class NearDuplicateIndex:
+    """
+    Firmas de los artículos almacenados, con las bandas LSH en memoria para encontrar candidatos
+    sin recorrer el índice. Cada banda es un array ordenado de enteros (hash << bits | posición),
+    unos 8 bytes por artículo y banda, en el que se busca por bisección. Se carga del fichero
+    al abrirse y crece con cada inserción. Los casi-duplicados descartados se guardan como
+    miembros del grupo del artículo original.
+    """
+    def __init__(self, path: str = NEAR_DUP_INDEX_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (source, title)
+            );
+            CREATE TABLE IF NOT EXISTS cluster_members (
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT,
+                of_source TEXT NOT NULL,
+                of_title TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (source, title)
+            );
+            CREATE INDEX IF NOT EXISTS cluster_members_of_idx ON cluster_members (of_source, of_title);
+        """)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SIGNATURE_VERSION:
+            self._resign()
+        self._conn.commit()
+        self._keys: list[tuple[str, str]] = []
+        self._signatures: list[bytes] = []
+        self._positions: dict[tuple[str, str], int] = {}
+        # Artículos aceptados en la deduplicación que aún no se han insertado: ya están en las
+        # bandas, pero solo se guardan en el fichero (y dejan de contar pasado PENDING_TTL) si se insertan
+        self._pending: dict[tuple[str, str], tuple[str | None, float]] = {}
+        entries: list[list[int]] = [[] for _ in range(LSH_BANDS)]
+        for source, title, blob in self._conn.execute("SELECT source, title, signature FROM signatures"):
+            position = len(self._keys)
+            self._keys.append((source, title))
+            self._signatures.append(blob)
+            self._positions[(source, title)] = position
+            for band, bucket in enumerate(_band_hashes(blob)):
+                entries[band].append(bucket << _POSITION_BITS | position)
+        self._bands = [array("Q", sorted(band)) for band in entries]
+
+    def _resign(self) -> None:
+        # Ficheros con firmas de título y entradilla/resumen: se rehacen a partir del título guardado
+        rows = self._conn.execute("SELECT source, title FROM signatures").fetchall()
+        blobs = [(signature(title), source, title) for source, title in rows]
+        self._conn.executemany("UPDATE signatures SET signature = ? WHERE source = ? AND title = ?",
+                               [row for row in blobs if row[0] is not None])
+        self._conn.executemany("DELETE FROM signatures WHERE source = ? AND title = ?",
+                               [row[1:] for row in blobs if row[0] is None])
+        self._conn.execute(f"PRAGMA user_version = {SIGNATURE_VERSION}")
+
+    def _index(self, key: tuple[str, str], blob: bytes) -> None:
+        position = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(blob)
+        self._positions[key] = position
+        for band, bucket in enumerate(_band_hashes(blob)):
+            bisect.insort(self._bands[band], bucket << _POSITION_BITS | position)
+
+    def _candidates(self, blob: bytes) -> set[int]:
+        candidates: set[int] = set()
+        for band, bucket in enumerate(_band_hashes(blob)):
+            entries = self._bands[band]
+            i = bisect.bisect_left(entries, bucket << _POSITION_BITS)
+            while i < len(entries) and entries[i] >> _POSITION_BITS == bucket:
+                candidates.add(entries[i] & ((1 << _POSITION_BITS) - 1))
+                i += 1
+        return candidates
+
+    def find(self, blob: bytes, source: str) -> tuple[tuple[str, str], float] | None:
+        """
+        Artículo (source, title) de otra fuente más parecido a la firma por encima de
+        NEAR_DUP_THRESHOLD, entre los almacenados y los pendientes de insertar, con su similitud.
+        Los de la misma fuente (dos papers de arXiv, dos vídeos, o el propio artículo pendiente
+        de una ejecución que falló) nunca se agrupan.
+        """
+        best, best_score = None, NEAR_DUP_THRESHOLD
+        now = time.monotonic()
+        with self._lock:
+            for position in self._candidates(blob):
+                key = self._keys[position]
+                pending = self._pending.get(key)
+                if key[0] == source or (pending is not None and now - pending[1] > PENDING_TTL):
+                    continue
+                score = similarity(blob, self._signatures[position])
+                if score >= best_score:
+                    best, best_score = key, score
+        return (best, best_score) if best is not None else None
+
+    def add_pending(self, source: str, title: str, url: str | None, blob: bytes) -> None:
+        """
+        Indexa un artículo aceptado para que sus casi-duplicados del mismo lote, o de otra
+        ingesta simultánea, se detecten antes de que se inserte.
+        """
+        with self._lock:
+            if (source, title) not in self._positions:
+                self._pending[(source, title)] = (url, time.monotonic())
+                self._index((source, title), blob)
+            elif (source, title) in self._pending:
+                self._pending[(source, title)] = (url, time.monotonic())
+
+    def commit(self, rows: list[dict]) -> None:
+        """
+        Pasa al índice persistente las firmas pendientes de los artículos ya insertados.
+        """
+        with self._lock:
+            added = []
+            for row in rows:
+                key = (row.get("source", ""), row.get("title", ""))
+                pending = self._pending.pop(key, None)
+                if pending is None:
+                    continue
+                added.append((*key, pending[0], self._signatures[self._positions[key]]))
+            if added:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO signatures (source, title, url, signature) VALUES (?, ?, ?, ?)", added
+                )
+                self._conn.commit()
+
+    def add_member(self, item: dict, of: tuple[str, str], score: float) -> None:
+        """
+        Registra `item` como cobertura de la misma noticia que el artículo `of`.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cluster_members (source, title, url, of_source, of_title, similarity, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (item.get("source", ""), item.get("title", ""), item.get("url"), *of, score, time.time()),
+            )
+            self._conn.commit()
+
+    def members(self, source: str, title: str) -> list[dict]:
+        """
+        Otras coberturas (source, title, url, similarity) agrupadas con el artículo.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT source, title, url, similarity FROM cluster_members WHERE of_source = ? AND of_title = ?",
+                (source, title),
+            )
+            return [dict(zip(("source", "title", "url", "similarity"), row)) for row in cursor.fetchall()]
+
+    def members_of(self, keys: list[tuple[str, str]]) -> dict[tuple[str, str], list[dict]]:
+        """
+        Como `members`, para varios artículos en una sola consulta por bloque.
+        """
+        found: dict[tuple[str, str], list[dict]] = {}
+        with self._lock:
+            for start in range(0, len(keys), 400):
+                chunk = keys[start:start + 400]
+                conditions = " OR ".join(["(of_source = ? AND of_title = ?)"] * len(chunk))
+                cursor = self._conn.execute(
+                    "SELECT of_source, of_title, source, title, url, similarity FROM cluster_members"
+                    f" WHERE {conditions} ORDER BY similarity DESC",
+                    [value for key in chunk for value in key],
+                )
+                for of_source, of_title, *member in cursor.fetchall():
+                    found.setdefault((of_source, of_title), []).append(
+                        dict(zip(("source", "title", "url", "similarity"), member))
+                    )
+        return found
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+_index: NearDuplicateIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """
+    Devuelve el índice compartido, cargándolo del fichero la primera vez (también se puede
+    precargar desde un hilo al arrancar la aplicación).
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+        return _index
+
+
+def commit_signatures(rows: list[dict]) -> None:
+    """
+    Añade al índice los artículos recién insertados, si la detección está activada.
+    """
+    if not NEAR_DUP_ENABLED or not rows:
+        return
+    try:
+        get_near_duplicate_index().commit(rows)
+    except Exception as e:
+        print(f"Error al actualizar el índice de casi-duplicados: {e}")
+
+
+def attach_members(rows: list[dict]) -> list[dict]:
+    """
+    Añade a cada artículo en 'cluster' las coberturas de otras fuentes descartadas como
+    casi-duplicados suyos (vacío si no hay), para mostrarlas junto al original.
+    """
+    if not rows:
+        return rows
+    members = get_near_duplicate_index().members_of([(row.get("source", ""), row.get("title", "")) for row in rows])
+    for row in rows:
+        row["cluster"] = members.get((row.get("source", ""), row.get("title", "")), [])
+    return rows
+
+
+def add_stored(rows: list[dict]) -> int:
+    """
+    Firma e indexa artículos ya almacenados. Devuelve cuántos se han añadido.
+    """
+    index = get_near_duplicate_index()
+    added = 0
+    for row in rows:
+        blob = signature(row.get("title", ""))
+        if blob is not None:
+            index.add_pending(row.get("source", ""), row.get("title", ""), row.get("url"), blob)
+            added += 1
+    index.commit(rows)
+    return added
+
+
+async def rebuild_near_duplicate_index() -> int:
+    """
+    Firma los artículos guardados antes de activar la detección, recorriéndolos por páginas.
+    """
+    cursor = None
+    total = 0
+    while True:
+        rows, cursor = await fetch_articles_page(cursor=cursor, limit=ARTICLES_MAX_PAGE_SIZE)
+        total += await asyncio.to_thread(add_stored, rows)
+        if cursor is None:
+            return total
+
+
+async def main():
+    try:
+        total = await rebuild_near_duplicate_index()
+        print(f"Índice de casi-duplicados: {total} artículos firmados, {len(get_near_duplicate_index())} en total")
+    finally:
+        await close_store()
+
+if __name__ == "__main__":
+    asyncio.run(main())
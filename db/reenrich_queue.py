@@ -0,0 +1,79 @@
+# db/reenrich_queue.py: Cola persistente (SQLite) de artículos guardados con un resumen provisional porque el LLM no respondía.
+import os
+import sqlite3
+import threading
+import time
+
+REENRICH_QUEUE_PATH = os.getenv("REENRICH_QUEUE_PATH", os.path.join(".cache", "reenrich_queue.sqlite3"))
+# Intentos fallidos tras los que se deja el resumen provisional como definitivo
+REENRICH_MAX_ATTEMPTS = int(os.getenv("REENRICH_MAX_ATTEMPTS", "5"))
+
+
+class ReenrichQueue:
+    """
+    Texto original de los artículos degradados, que no se guarda en la tabla de artículos,
+    con el número de intentos de re-enriquecimiento.
+    """
+    def __init__(self, path: str = REENRICH_QUEUE_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS reenrich_queue ("
+            " source TEXT NOT NULL,"
+            " title TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (source, title))"
+        )
+        self._conn.commit()
+
+    def add(self, source: str, title: str, text: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO reenrich_queue (source, title, text, created_at) VALUES (?, ?, ?, ?)",
+                (source, title, text, time.time()),
+            )
+            self._conn.commit()
+
+    def take(self, limit: int) -> list[dict]:
+        """
+        Los `limit` artículos pendientes más antiguos.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT source, title, text, attempts FROM reenrich_queue ORDER BY created_at LIMIT ?", (limit,)
+            )
+            return [dict(zip(("source", "title", "text", "attempts"), row)) for row in cursor.fetchall()]
+
+    def remove(self, source: str, title: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM reenrich_queue WHERE source = ? AND title = ?", (source, title))
+            self._conn.commit()
+
+    def failed(self, source: str, title: str) -> None:
+        """
+        Cuenta un intento fallido; al llegar a REENRICH_MAX_ATTEMPTS el artículo sale de la cola.
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE reenrich_queue SET attempts = attempts + 1 WHERE source = ? AND title = ?", (source, title)
+            )
+            self._conn.execute("DELETE FROM reenrich_queue WHERE attempts >= ?", (REENRICH_MAX_ATTEMPTS,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reenrich_queue").fetchone()[0]
+
+
+_queue: ReenrichQueue | None = None
+
+
+def get_reenrich_queue() -> ReenrichQueue:
+    global _queue
+    if _queue is None:
+        _queue = ReenrichQueue()
+    return _queue
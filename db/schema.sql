@@ -0,0 +1,67 @@
+-- db/schema.sql: Esquema de la tabla de artículos en Supabase (PostgreSQL).
+create table if not exists articles (
+    id bigint generated by default as identity primary key,
+    source text not null,
+    title text not null,
+    summary text,
+    category text,
+    url text,
+    date date,
+    created_at timestamptz not null default now()
+);
+
+-- Clave única usada por la inserción en bloque (on_conflict=source,title) para descartar duplicados
+create unique index if not exists articles_source_title_key on articles (source, title);
+
+-- Índice para la paginación por cursor del dashboard: order=date.desc,source.asc,id.asc
+create index if not exists articles_date_source_id_idx on articles (date desc, source, id);
+
+-- Título normalizado (normalize_title en db/storage.py: espacios colapsados y minúsculas) por el que
+-- known_articles busca duplicados antes del enriquecimiento; lo rellena la aplicación al insertar.
+-- Las filas anteriores se rellenan después con `uv run db/backfill_title_keys.py`, que usa la misma
+-- función de Python (en SQL no hay un equivalente exacto de casefold ni de los espacios Unicode)
+alter table articles add column if not exists title_key text;
+create index if not exists articles_title_key_idx on articles (source, title_key);
+
+-- Índice para descartar duplicados por URL antes del enriquecimiento (known_articles)
+create index if not exists articles_url_idx on articles (url);
+
+-- Artículos guardados con un resumen provisional porque el LLM no respondía (agent/reenrich.py
+-- los vuelve a enriquecer y los desmarca)
+alter table articles add column if not exists degraded boolean not null default false;
+
+-- Búsqueda de texto completo sobre título (peso A) y resumen (peso B) en español e inglés
+alter table articles add column if not exists search_vector tsvector generated always as (
+    setweight(to_tsvector('spanish', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('spanish', coalesce(summary, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(summary, '')), 'B')
+) stored;
+
+create index if not exists articles_search_vector_idx on articles using gin (search_vector);
+
+-- Llamada desde db/search.py vía /rest/v1/rpc/search_articles. `query` llega ya en formato
+-- tsquery con prefijos (p. ej. 'modelo:* & lenguaje:*') y se lematiza en ambos idiomas.
+create or replace function search_articles(query text, max_results int default 20)
+returns table (
+    id bigint,
+    source text,
+    title text,
+    category text,
+    summary text,
+    url text,
+    date date,
+    rank real
+)
+language sql stable
+as $$
+    with q as (
+        select to_tsquery('spanish', query) || to_tsquery('english', query) as tsq
+    )
+    select a.id, a.source, a.title, a.category, a.summary, a.url, a.date,
+           ts_rank_cd(a.search_vector, q.tsq) as rank
+    from articles a, q
+    where a.search_vector @@ q.tsq
+    order by rank desc, a.date desc
+    limit max_results;
+$$;
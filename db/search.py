@@ -0,0 +1,196 @@
+# db/search.py: Búsqueda de texto completo sobre título y resumen (Supabase tsvector o réplica local SQLite FTS5).
+import sys
+import os
+# Agregar el directorio padre al path para permitir importaciones relativas
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import re
+import sqlite3
+import threading
+from db.articles import ARTICLES_MAX_PAGE_SIZE, fetch_articles_page
+from db.storage import STORAGE_BACKEND, close_store
+from db.supabase_client import get_supabase
+
+# "supabase" usa la función search_articles de db/schema.sql; "sqlite" usa la réplica local
+# (por defecto cuando los artículos también están en SQLite)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "sqlite" if STORAGE_BACKEND == "sqlite" else "supabase")
+# Mantener la réplica local actualizada en cada ingesta (siempre activo con el backend sqlite)
+SEARCH_MIRROR = os.getenv("SEARCH_MIRROR", "0") == "1" or SEARCH_BACKEND == "sqlite"
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(".cache", "search.sqlite3"))
+SEARCH_MAX_RESULTS = 100
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(q: str) -> list[str]:
+    """
+    Extrae las palabras de la consulta descartando operadores y signos de puntuación.
+    """
+    return _TOKEN_RE.findall(q.lower())
+
+
+def build_tsquery(q: str) -> str:
+    """
+    Convierte la consulta del usuario en un tsquery de PostgreSQL con búsqueda por prefijo
+    en cada término (`ia:* & regul:*` encuentra "regulación" y "regulation").
+    """
+    return " & ".join(f"{term}:*" for term in query_terms(q))
+
+
+def build_fts5_query(q: str) -> str:
+    """
+    Equivalente para SQLite FTS5: cada término entrecomillado y con `*` de prefijo.
+    """
+    return " ".join(f'"{term}"*' for term in query_terms(q))
+
+
+class SearchIndex:
+    """
+    Réplica local de título y resumen indexada con FTS5 para búsquedas sin Supabase.
+    FTS5 no trae lematizador en español: se usa `porter` (inglés), sin diacríticos, más
+    consultas por prefijo, que cubren la mayoría de variantes en español. Las búsquedas del
+    servidor se ejecutan en un hilo (search_articles), de ahí el candado.
+    """
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS search_docs (
+                rowid INTEGER PRIMARY KEY,
+                article_id INTEGER,
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                summary TEXT,
+                category TEXT,
+                url TEXT,
+                date TEXT,
+                UNIQUE (source, title)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+                title, summary,
+                content='search_docs', content_rowid='rowid',
+                tokenize='porter unicode61 remove_diacritics 2',
+                prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS search_docs_ai AFTER INSERT ON search_docs BEGIN
+                INSERT INTO search_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_docs_ad AFTER DELETE ON search_docs BEGIN
+                INSERT INTO search_fts (search_fts, rowid, title, summary) VALUES ('delete', old.rowid, old.title, old.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS search_docs_au AFTER UPDATE ON search_docs BEGIN
+                INSERT INTO search_fts (search_fts, rowid, title, summary) VALUES ('delete', old.rowid, old.title, old.summary);
+                INSERT INTO search_fts (rowid, title, summary) VALUES (new.rowid, new.title, new.summary);
+            END;
+        """)
+        self._conn.commit()
+
+    def add(self, rows: list[dict]) -> None:
+        """
+        Añade o actualiza artículos en la réplica (clave única: source, title).
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO search_docs (article_id, source, title, summary, category, url, date)"
+                " VALUES (:id, :source, :title, :summary, :category, :url, :date)"
+                " ON CONFLICT (source, title) DO UPDATE SET"
+                " article_id = excluded.article_id, summary = excluded.summary,"
+                " category = excluded.category, url = excluded.url, date = excluded.date",
+                [
+                    {key: row.get(key) for key in ("id", "source", "title", "summary", "category", "url", "date")}
+                    for row in rows
+                ],
+            )
+            self._conn.commit()
+
+    def search(self, q: str, limit: int = 20) -> list[dict]:
+        """
+        Devuelve los artículos que coinciden con la consulta, ordenados por relevancia (bm25,
+        con más peso en el título).
+        """
+        match = build_fts5_query(q)
+        if not match:
+            return []
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT d.article_id AS id, d.source, d.title, d.category, d.summary, d.url, d.date,"
+                " -bm25(search_fts, 10.0, 1.0) AS rank"
+                " FROM search_fts JOIN search_docs d ON d.rowid = search_fts.rowid"
+                " WHERE search_fts MATCH ? ORDER BY rank DESC, d.date DESC LIMIT ?",
+                (match, limit),
+            )
+            return [dict(row) for row in cursor.fetchall()]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM search_docs").fetchone()[0]
+
+
+_index: SearchIndex | None = None
+
+
+def get_search_index() -> SearchIndex:
+    """
+    Devuelve la réplica local compartida, abriéndola la primera vez.
+    """
+    global _index
+    if _index is None:
+        _index = SearchIndex()
+    return _index
+
+
+def mirror_articles(rows: list[dict]) -> None:
+    """
+    Copia en la réplica local los artículos recién insertados, si está activada.
+    """
+    if not SEARCH_MIRROR or not rows:
+        return
+    try:
+        get_search_index().add(rows)
+    except Exception as e:
+        print(f"Error al actualizar el índice de búsqueda local: {e}")
+
+
+async def search_articles(q: str, limit: int = 20) -> list[dict]:
+    """
+    Busca artículos por título y resumen con ranking por relevancia.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_RESULTS))
+    if not query_terms(q):
+        return []
+    if SEARCH_BACKEND == "sqlite":
+        # FTS5 es síncrono: en un hilo, para no bloquear el resto de peticiones ni los SSE
+        return await asyncio.to_thread(lambda: get_search_index().search(q, limit))
+    response = await get_supabase().rpc("search_articles", {"query": build_tsquery(q), "max_results": limit})
+    response.raise_for_status()
+    return response.json()
+
+
+async def rebuild_search_index() -> int:
+    """
+    Reconstruye la réplica local recorriendo todos los artículos de Supabase por páginas.
+    """
+    index = get_search_index()
+    cursor = None
+    total = 0
+    while True:
+        rows, cursor = await fetch_articles_page(cursor=cursor, limit=ARTICLES_MAX_PAGE_SIZE)
+        index.add(rows)
+        total += len(rows)
+        if cursor is None:
+            return total
+
+
+async def main():
+    try:
+        total = await rebuild_search_index()
+        print(f"Índice de búsqueda local reconstruido con {total} artículos")
+    finally:
+        await close_store()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,294 @@
+# db/storage.py: Almacenamiento de artículos intercambiable: Supabase (PostgREST) o SQLite embebido para modo offline y benchmarks.
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from db.supabase_client import close_supabase, get_supabase, in_filter, quote_value
+from metrics import DB_ROUND_TRIPS
+
+# "supabase" (por defecto) o "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join(".cache", "articles.sqlite3"))
+
+ARTICLE_FIELDS = ("source", "title", "summary", "category", "url", "date", "degraded")
+# Columnas que usa el dashboard; el resto no se transfiere
+ARTICLE_COLUMNS = "id,source,title,category,summary,url,date"
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normaliza un título para compararlo sin depender de mayúsculas ni espacios. Se guarda en
+    la columna title_key, por la que se buscan los duplicados.
+    """
+    return re.sub(r"\s+", " ", title).strip().casefold()
+
+
+class ArticleStore(ABC):
+    """
+    Operaciones sobre la tabla de artículos que usa la aplicación. `after` es la posición
+    (date, source, id) de la última fila de la página anterior en el orden del listado:
+    date desc, source asc, id asc.
+    """
+    @abstractmethod
+    async def has_articles(self, source: str, day: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def find_articles(self, sources: list[str], title_keys: list[str], urls: list[str] | None = None) -> list[dict]:
+        """
+        Filas (source, title, url) de `sources` cuyo título normalizado (normalize_title) está
+        en `title_keys` o, si se indica, cuya URL está en `urls`.
+        """
+
+    @abstractmethod
+    async def insert_articles(self, rows: list[dict]) -> list[dict]:
+        """
+        Inserta las filas ignorando las que repitan (source, title); devuelve las insertadas.
+        """
+
+    @abstractmethod
+    async def update_enrichment(self, source: str, title: str, summary: str, category: str) -> list[dict]:
+        """
+        Sustituye el resumen y la categoría del artículo y lo desmarca como degradado;
+        devuelve la fila actualizada (vacío si ya no existe).
+        """
+
+    @abstractmethod
+    async def list_articles(self, limit: int, source: str | None = None, category: str | None = None,
+                            date_from: str | None = None, date_to: str | None = None,
+                            after: tuple[str, str, int] | None = None, q: str | None = None) -> list[dict]:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+
+class SupabaseStore(ArticleStore):
+    async def has_articles(self, source: str, day: str) -> bool:
+        data = await get_supabase().select("articles", {
+            "select": "id",
+            "date": f"eq.{day}",
+            "source": f"eq.{source}",
+            "limit": 1,
+        })
+        return len(data) > 0
+
+    async def find_articles(self, sources: list[str], title_keys: list[str], urls: list[str] | None = None) -> list[dict]:
+        params = {"select": "source,title,url", "source": in_filter(sources)}
+        if urls:
+            params["or"] = f"(title_key.{in_filter(title_keys)},url.{in_filter(urls)})"
+        else:
+            params["title_key"] = in_filter(title_keys)
+        return await get_supabase().select("articles", params)
+
+    async def insert_articles(self, rows: list[dict]) -> list[dict]:
+        rows = [{**row, "title_key": normalize_title(row.get("title", ""))} for row in rows]
+        response = await get_supabase().insert_many("articles", rows, on_conflict="source,title")
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"Supabase respondió {response.status_code}: {response.text}")
+        return response.json()
+
+    async def update_enrichment(self, source: str, title: str, summary: str, category: str) -> list[dict]:
+        response = await get_supabase().update(
+            "articles",
+            {"source": f"eq.{source}", "title": f"eq.{title}"},
+            {"summary": summary, "category": category, "degraded": False},
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Supabase respondió {response.status_code}: {response.text}")
+        return response.json()
+
+    async def list_articles(self, limit, source=None, category=None, date_from=None, date_to=None,
+                            after=None, q=None) -> list[dict]:
+        params: list[tuple[str, str]] = [
+            ("select", ARTICLE_COLUMNS),
+            ("order", "date.desc,source.asc,id.asc"),
+            ("limit", str(limit)),
+        ]
+        if source:
+            params.append(("source", f"eq.{source}"))
+        if category:
+            params.append(("category", f"eq.{category}"))
+        if date_from:
+            params.append(("date", f"gte.{date_from}"))
+        if date_to:
+            params.append(("date", f"lte.{date_to}"))
+
+        conditions = []
+        if after:
+            last_date, last_source, last_id = after
+            last_date, last_source = quote_value(last_date), quote_value(last_source)
+            conditions.append(
+                f"or(date.lt.{last_date},"
+                f"and(date.eq.{last_date},source.gt.{last_source}),"
+                f"and(date.eq.{last_date},source.eq.{last_source},id.gt.{last_id}))"
+            )
+        if q:
+            pattern = quote_value(f"*{q}*")
+            conditions.append(f"or(title.ilike.{pattern},summary.ilike.{pattern})")
+        if conditions:
+            params.append(("and", f"({','.join(conditions)})"))
+        return await get_supabase().select("articles", params)
+
+
+class SQLiteStore(ArticleStore):
+    """
+    Tabla de artículos en un fichero SQLite local, con los mismos índices que db/schema.sql
+    más uno por URL. Las consultas se ejecutan en un hilo para no bloquear el bucle de eventos.
+    """
+    def __init__(self, path: str = SQLITE_DB_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                summary TEXT,
+                category TEXT,
+                url TEXT,
+                date TEXT,
+                degraded INTEGER NOT NULL DEFAULT 0,
+                title_key TEXT,
+                created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now'))
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS articles_source_title_key ON articles (source, title);
+            CREATE INDEX IF NOT EXISTS articles_date_source_id_idx ON articles (date DESC, source, id);
+            CREATE INDEX IF NOT EXISTS articles_url_idx ON articles (url);
+        """)
+        # Ficheros creados antes de las columnas degraded y title_key
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(articles)")}
+        if "degraded" not in columns:
+            self._conn.execute("ALTER TABLE articles ADD COLUMN degraded INTEGER NOT NULL DEFAULT 0")
+        if "title_key" not in columns:
+            self._conn.execute("ALTER TABLE articles ADD COLUMN title_key TEXT")
+        self._conn.create_function("normalize_title", 1, normalize_title, deterministic=True)
+        self._conn.execute("UPDATE articles SET title_key = normalize_title(title) WHERE title_key IS NULL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS articles_title_key_idx ON articles (source, title_key)")
+        self._conn.commit()
+
+    def _query(self, sql: str, params: list | tuple = ()) -> list[dict]:
+        DB_ROUND_TRIPS.inc(backend="sqlite", operation="select")
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _insert(self, rows: list[dict]) -> list[dict]:
+        inserted = []
+        DB_ROUND_TRIPS.inc(backend="sqlite", operation="insert")
+        with self._lock:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT INTO articles (source, title, summary, category, url, date, degraded, title_key)"
+                    " VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 0), ?) ON CONFLICT (source, title) DO NOTHING"
+                    " RETURNING id, source, title, summary, category, url, date, degraded, created_at",
+                    [*(row.get(field) for field in ARTICLE_FIELDS), normalize_title(row.get("title", ""))],
+                )
+                inserted.extend(dict(r) for r in cursor.fetchall())
+            self._conn.commit()
+        return inserted
+
+    def _update(self, sql: str, params: list | tuple) -> list[dict]:
+        DB_ROUND_TRIPS.inc(backend="sqlite", operation="update")
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+            self._conn.commit()
+        return rows
+
+    async def has_articles(self, source: str, day: str) -> bool:
+        rows = await asyncio.to_thread(
+            self._query, "SELECT 1 FROM articles WHERE source = ? AND date = ? LIMIT 1", (source, day)
+        )
+        return len(rows) > 0
+
+    async def find_articles(self, sources: list[str], title_keys: list[str], urls: list[str] | None = None) -> list[dict]:
+        def placeholders(values: list) -> str:
+            return ",".join("?" * len(values))
+
+        sql = (f"SELECT source, title, url FROM articles WHERE source IN ({placeholders(sources)})"
+               f" AND (title_key IN ({placeholders(title_keys)})")
+        params = [*sources, *title_keys]
+        if urls:
+            sql += f" OR url IN ({placeholders(urls)})"
+            params.extend(urls)
+        return await asyncio.to_thread(self._query, sql + ")", params)
+
+    async def insert_articles(self, rows: list[dict]) -> list[dict]:
+        return await asyncio.to_thread(self._insert, rows)
+
+    async def update_enrichment(self, source: str, title: str, summary: str, category: str) -> list[dict]:
+        return await asyncio.to_thread(
+            self._update,
+            "UPDATE articles SET summary = ?, category = ?, degraded = 0 WHERE source = ? AND title = ?"
+            " RETURNING id, source, title, summary, category, url, date, degraded, created_at",
+            (summary, category, source, title),
+        )
+
+    async def list_articles(self, limit, source=None, category=None, date_from=None, date_to=None,
+                            after=None, q=None) -> list[dict]:
+        where, params = [], []
+        if source:
+            where.append("source = ?")
+            params.append(source)
+        if category:
+            where.append("category = ?")
+            params.append(category)
+        if date_from:
+            where.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            where.append("date <= ?")
+            params.append(date_to)
+        if after:
+            last_date, last_source, last_id = after
+            where.append("(date < ? OR (date = ? AND source > ?) OR (date = ? AND source = ? AND id > ?))")
+            params.extend([last_date, last_date, last_source, last_date, last_source, last_id])
+        if q:
+            where.append("(title LIKE ? OR summary LIKE ?)")
+            params.extend([f"%{q}%", f"%{q}%"])
+        sql = f"SELECT {ARTICLE_COLUMNS} FROM articles"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY date DESC, source ASC, id ASC LIMIT ?"
+        params.append(limit)
+        return await asyncio.to_thread(self._query, sql, params)
+
+    async def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_store: ArticleStore | None = None
+
+
+def get_store() -> ArticleStore:
+    """
+    Devuelve el almacenamiento configurado con STORAGE_BACKEND, creándolo la primera vez.
+    """
+    global _store
+    if _store is None:
+        if STORAGE_BACKEND == "sqlite":
+            _store = SQLiteStore()
+        elif STORAGE_BACKEND == "supabase":
+            _store = SupabaseStore()
+        else:
+            raise ValueError(f"STORAGE_BACKEND no válido: {STORAGE_BACKEND}")
+    return _store
+
+
+async def close_store() -> None:
+    """
+    Libera las conexiones del almacenamiento, si se llegó a crear (y el pool de Supabase,
+    que también usa la búsqueda).
+    """
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
+    await close_supabase()
@@ -1,9 +1,36 @@
-# db/supabase_client.py: Cliente para interactuar con Supabase PostgreSQL vía REST API.
+# db/supabase_client.py: Cliente asíncrono para interactuar con Supabase PostgreSQL vía REST API (PostgREST).
+import asyncio
 import os
-import requests
+import httpx
+from metrics import DB_ROUND_TRIPS
+
+# Configuración del pool de conexiones compartido
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+SUPABASE_RETRIES = int(os.getenv("SUPABASE_RETRIES", "3"))
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+def quote_value(value) -> str:
+    """
+    Entrecomilla un valor para un filtro de PostgREST, de modo que comas, paréntesis
+    o comillas dentro de un título no rompan la consulta.
+    """
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def in_filter(values) -> str:
+    """
+    Construye un filtro `in.` de PostgREST con cada valor entrecomillado.
+    """
+    return f"in.({','.join(quote_value(value) for value in values)})"
+
 
 class SupabaseClient:
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
         self.url = os.getenv("SUPABASE_URL")  # Ej: https://xyzcompany.supabase.co
         self.key = os.getenv("SUPABASE_KEY")  # Clave anon o servicio de Supabase
         if not self.url or not self.key:
@@ -13,27 +40,103 @@ class SupabaseClient:
             "Authorization": f"Bearer {self.key}",
             "Content-Type": "application/json"
         }
+        self.client = http_client or httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            headers=self.headers,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(SUPABASE_TIMEOUT),
+        )
 
-    def insert(self, table: str, data: dict) -> requests.Response:
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Envía la petición reutilizando el pool y reintenta con espera exponencial
+        ante errores de red o respuestas 429/5xx transitorias.
+        """
+        for attempt in range(SUPABASE_RETRIES + 1):
+            try:
+                DB_ROUND_TRIPS.inc(backend="supabase", operation=method.lower())
+                response = await self.client.request(method, path, **kwargs)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == SUPABASE_RETRIES:
+                    return response
+                print(f"Supabase respondió {response.status_code}, reintentando...")
+            except httpx.TransportError as e:
+                if attempt == SUPABASE_RETRIES:
+                    print(f"Error al conectar con Supabase: {e}")
+                    raise
+                print(f"Error de red con Supabase ({e}), reintentando...")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        raise RuntimeError("unreachable")
+
+    async def insert(self, table: str, data: dict) -> httpx.Response:
         """
         Inserta un registro en la tabla especificada de Supabase.
         """
-        endpoint = f"{self.url}/rest/v1/{table}"
-        try:
-            response = requests.post(endpoint, json=data, headers=self.headers)
-            return response
-        except Exception as e:
-            print(f"Error al conectar con Supabase: {e}")
-            raise
+        return await self._request("POST", f"/{table}", json=data)
 
-    def get_all(self, table: str) -> requests.Response:
+    async def insert_many(self, table: str, rows: list[dict], on_conflict: str | None = None) -> httpx.Response:
+        """
+        Inserta varios registros en una sola petición (bulk insert de PostgREST).
+        Con `on_conflict` se ignoran las filas que violen esa clave única, y la respuesta
+        solo contiene las filas realmente insertadas.
+        """
+        params = {"on_conflict": on_conflict} if on_conflict else None
+        headers = {"Prefer": "resolution=ignore-duplicates,return=representation"}
+        return await self._request("POST", f"/{table}", json=rows, headers=headers, params=params)
+
+    async def update(self, table: str, params: dict, data: dict) -> httpx.Response:
+        """
+        Actualiza las filas que cumplen los filtros de PostgREST dados; la respuesta
+        contiene las filas actualizadas.
+        """
+        headers = {"Prefer": "return=representation"}
+        return await self._request("PATCH", f"/{table}", json=data, headers=headers, params=params)
+
+    async def select(self, table: str, params: dict | list[tuple[str, str]]) -> list[dict]:
+        """
+        Consulta la tabla con los parámetros de PostgREST dados (select, filtros, order, limit...).
+        Lanza una excepción si Supabase devuelve un error.
+        """
+        response = await self._request("GET", f"/{table}", params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def rpc(self, function: str, args: dict) -> httpx.Response:
+        """
+        Llama a una función SQL expuesta por PostgREST (/rest/v1/rpc/<function>).
+        """
+        return await self._request("POST", f"/rpc/{function}", json=args)
+
+    async def get_all(self, table: str) -> httpx.Response:
         """
         Obtiene todos los registros de la tabla especificada de Supabase.
         """
-        endpoint = f"{self.url}/rest/v1/{table}?select=*"
-        try:
-            response = requests.get(endpoint, headers=self.headers)
-            return response
-        except Exception as e:
-            print(f"Error al conectar con Supabase: {e}")
-            raise
+        return await self._request("GET", f"/{table}", params={"select": "*"})
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_supabase: SupabaseClient | None = None
+
+
+def get_supabase() -> SupabaseClient:
+    """
+    Devuelve el cliente compartido (y su pool de conexiones), creándolo la primera vez.
+    """
+    global _supabase
+    if _supabase is None:
+        _supabase = SupabaseClient()
+    return _supabase
+
+
+async def close_supabase() -> None:
+    """
+    Cierra el pool de conexiones compartido, si se llegó a crear.
+    """
+    global _supabase
+    if _supabase is not None:
+        await _supabase.aclose()
+        _supabase = None
@@ -17,40 +17,15 @@ echo.
 echo [INFO] Iniciando ejecución de scrapers...
 echo.
 
-echo ----------------------------------------
-echo 1/3 - Ejecutando News Scraper...
-echo ----------------------------------------
-uv run scraper\news_scraper.py
+REM Un solo proceso actualiza todas las fuentes de sources.toml (en paralelo y sin solapes).
+REM Para actualizaciones periodicas sin este script: "uv run scheduler.py" o SCHEDULER_ENABLED=1 en la API.
+uv run scheduler.py --once
 if %ERRORLEVEL% neq 0 (
-    echo [ERROR] Error en news_scraper.py
+    echo [ERROR] Error en scheduler.py
     pause
     exit /b %ERRORLEVEL%
 )
-echo [SUCCESS] News scraper completado.
-echo.
-
-echo ----------------------------------------
-echo 2/3 - Ejecutando ArXiv Scraper...
-echo ----------------------------------------
-uv run scraper\arxiv_scraper.py
-if %ERRORLEVEL% neq 0 (
-    echo [ERROR] Error en arxiv_scraper.py
-    pause
-    exit /b %ERRORLEVEL%
-)
-echo [SUCCESS] ArXiv scraper completado.
-echo.
-
-echo ----------------------------------------
-echo 3/3 - Ejecutando YouTube Scraper...
-echo ----------------------------------------
-uv run scraper\youtube_scraper.py
-if %ERRORLEVEL% neq 0 (
-    echo [ERROR] Error en youtube_scraper.py
-    pause
-    exit /b %ERRORLEVEL%
-)
-echo [SUCCESS] YouTube scraper completado.
+echo [SUCCESS] Fuentes actualizadas.
 echo.
 
 echo ========================================
@@ -0,0 +1,195 @@
+# jobs.py: Cola de trabajos en segundo plano para las actualizaciones de fuentes (/update/*).
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+from httpx import AsyncClient
+from metrics import instrument_client
+from db.storage import ARTICLE_COLUMNS
+from shared_definitions import Deps, RunStats
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "3"))
+# Número de trabajos terminados que se conservan para consultar su estado
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+# Segundos entre mensajes de progreso en /jobs/{id}/events cuando no se inserta nada
+JOB_PROGRESS_INTERVAL = float(os.getenv("JOB_PROGRESS_INTERVAL", "1"))
+
+Runner = Callable[[Deps], Awaitable[int]]
+
+
+@dataclass
+class Job:
+    source: str
+    run: Runner = field(repr=False)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued | running | done | failed
+    stats: RunStats = field(default_factory=RunStats)
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    added: int | None = None
+    error: str | None = None
+    finished: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    # Artículos insertados hasta ahora, en el orden en que se insertaron
+    articles: list[dict] = field(default_factory=list, repr=False)
+    # Conexiones abiertas en /jobs/{id}/events
+    subscribers: int = 0
+    # Se activa (y se sustituye por uno nuevo) con cada cambio que deban ver los suscriptores
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    async def wait(self) -> None:
+        """
+        Espera a que el trabajo termine (bien o con error).
+        """
+        await self.finished.wait()
+
+    def add_articles(self, rows: list[dict]) -> None:
+        """
+        Registra artículos recién insertados y avisa a quien esté siguiendo el trabajo.
+        """
+        self.articles.extend({key: row.get(key) for key in ARTICLE_COLUMNS.split(",")} for row in rows)
+        self.notify()
+
+    def notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def events(self, after: int = 0) -> AsyncIterator[tuple[str, dict, int | None]]:
+        """
+        Emite ("article", fila, n) por cada artículo insertado desde el n.º `after` (también los
+        anteriores a la suscripción), ("progress", contadores, None) cuando cambian y
+        ("done", estado, None) al terminar. `n` es la posición del artículo contando desde 1, que
+        el cliente devuelve en Last-Event-ID al reconectar para no recibir dos veces el mismo.
+        """
+        sent = max(0, after)
+        last_progress = None
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                for index, article in enumerate(self.articles[sent:], start=sent + 1):
+                    yield "article", article, index
+                sent = max(sent, len(self.articles))
+                if not self.active:
+                    yield "done", self.to_dict(), None
+                    return
+                progress = asdict(self.stats)
+                if progress != last_progress:
+                    last_progress = progress
+                    yield "progress", {"id": self.id, "source": self.source, "status": self.status, "progress": progress}, None
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=JOB_PROGRESS_INTERVAL)
+                except TimeoutError:
+                    pass
+        finally:
+            self.subscribers -= 1
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "source": self.source,
+            "status": self.status,
+            "progress": asdict(self.stats),
+            "added": self.added,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Ejecuta los trabajos con un pool de workers. Solo hay un trabajo activo por fuente:
+    pedir otra vez la misma fuente mientras está en cola o en ejecución devuelve ese trabajo.
+    Todos los trabajos comparten un cliente HTTP, que mantiene las conexiones abiertas entre
+    ejecuciones (el modelo del LLM tiene su propio pool, ver agent/registry.py).
+    """
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self._queue: asyncio.Queue[Job] = asyncio.Queue()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active: dict[str, Job] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._client: AsyncClient | None = None
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._client = AsyncClient()
+            instrument_client(self._client)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def submit(self, source: str, run: Runner) -> tuple[Job, bool]:
+        """
+        Encola un trabajo para `source`. Devuelve el trabajo y si se ha reutilizado uno activo.
+        """
+        current = self._active.get(source)
+        if current is not None and current.active:
+            return current, True
+        job = Job(source=source, run=run)
+        self._active[source] = job
+        self._jobs[job.id] = job
+        self._trim_history()
+        self._queue.put_nowait(job)
+        return job, False
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def _trim_history(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            deps = Deps(client=self._client, stats=job.stats, on_inserted=job.add_articles,
+                        watched=lambda: job.subscribers > 0)
+            job.added = await job.run(deps)
+            job.status = "done"
+        except Exception as e:
+            print(f"Error en el trabajo {job.id} ({job.source}): {e}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            if self._active.get(job.source) is job:
+                del self._active[job.source]
+            job.finished.set()
+            job.notify()
+
+
+_manager: JobManager | None = None
+
+
+def get_job_manager() -> JobManager:
+    global _manager
+    if _manager is None:
+        _manager = JobManager()
+    return _manager
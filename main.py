@@ -1,31 +1,64 @@
 # main.py
 
-import os
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Header, Request, HTTPException, Query
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from supabase import create_client, Client
-from scraper.news_scraper import scrape_news
-from scraper.arxiv_scraper import scrape_arxiv
-from scraper.youtube_scraper import scrape_youtube
+from scraper.sources import get_source, get_sources, run_source
 import logfire
 from dotenv import load_dotenv
 import asyncio
+import json
 import uvicorn
-from httpx import AsyncClient
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import date
-from shared_definitions import Deps
+from urllib.parse import urlencode
+from agent.reenrich import REENRICH_JOB, reenrich_degraded
+from agent.registry import close_models
+from db.articles import ARTICLES_MAX_PAGE_SIZE, ARTICLES_PAGE_SIZE, fetch_articles_page
+from db.search import search_articles
+from db.near_duplicates import NEAR_DUP_ENABLED, attach_members, get_near_duplicate_index
+from db.storage import close_store, get_store
+from jobs import get_job_manager
+from scheduler import SCHEDULER_ENABLED, Scheduler
+from response_cache import cached_response
+from metrics import render_metrics, stage
 
 load_dotenv()
 
-# 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
-logfire.configure(send_to_logfire='if-token-present')
-logfire.instrument_pydantic_ai()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Al arrancar el servidor y no al importar el módulo (scripts, recargas de uvicorn).
+    # 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
+    logfire.configure(send_to_logfire='if-token-present')
+    logfire.instrument_pydantic_ai()
+    # Arrancar los workers que ejecutan las actualizaciones en segundo plano
+    get_job_manager().start()
+    app.state.preload = None
+    if NEAR_DUP_ENABLED:
+        # Cargar el índice de casi-duplicados en segundo plano, antes de la primera ingesta
+        app.state.preload = asyncio.create_task(asyncio.to_thread(get_near_duplicate_index))
+    scheduler = Scheduler(get_job_manager())
+    if SCHEDULER_ENABLED:
+        # Actualizaciones periódicas de cada fuente (intervalos en sources.toml)
+        scheduler.start()
+    yield
+    if app.state.preload is not None:
+        # Si sigue cargando se deja de esperar (el hilo termina por su cuenta); si falló, se muestra
+        app.state.preload.cancel()
+        (result,) = await asyncio.gather(app.state.preload, return_exceptions=True)
+        if isinstance(result, Exception):
+            print(f"Error al precargar el índice de casi-duplicados: {result}")
+    await scheduler.stop()
+    await get_job_manager().stop()
+    # Cerrar los pools de conexiones compartidos con la base de datos y con Gemini
+    await close_store()
+    await close_models()
 
 
-app = FastAPI(title="AI News Summarizer")
+app = FastAPI(title="AI News Summarizer", lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 
 # Configurar archivos estáticos
@@ -36,20 +69,13 @@ app.mount("/static", StaticFiles(directory="templates/static"), name="static")
 async def favicon():
     return FileResponse("public/favicon.ico")
 
-# Configurar cliente de Supabase
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),  # type: ignore
-    os.getenv("SUPABASE_KEY")  # type: ignore
-    )
-
-def check_articles_exist_today(source: str) -> bool:
+async def check_articles_exist_today(source: str) -> bool:
     """
     Verifica si ya existen artículos de una fuente específica para la fecha actual.
     """
     today = str(date.today())
     try:
-        response = supabase.table("articles").select('id').eq("date", today).eq("source", source).execute()
-        return len(getattr(response, 'data', [])) > 0
+        return await get_store().has_articles(source, today)
     except Exception as e:
         print(f"Error al verificar artículos existentes para {source}: {e}")
         return False
@@ -58,116 +84,124 @@ def check_articles_exist_today(source: str) -> bool:
 @app.get("/")
 async def home(request: Request):
     """
-    Ruta principal que obtiene los artículos procesados desde Supabase
-    y los muestra en la plantilla HTML 'index.html'.
+    Ruta principal que obtiene la primera página de artículos procesados desde Supabase
+    y la muestra en la plantilla HTML 'index.html'. El resto se carga desde /api/articles.
+    La página renderizada se cachea hasta la siguiente ingesta.
+    """
+    async def render() -> tuple[bytes, bool]:
+        cacheable = True
+        with stage("render", source="home"):
+            try:
+                # Primera página ordenada por fecha (desc), fuente (asc) e id
+                articles, next_cursor = await fetch_articles_page()
+                articles = await with_clusters(articles)
+                print(f"Artículos encontrados: {len(articles)}")
+            except Exception as e:
+                articles, next_cursor = [], None
+                cacheable = False
+                print(f"Error al recuperar datos de Supabase: {e}")
+            response = templates.TemplateResponse(
+                "index.html",
+                {"request": request, "articles": articles, "next_cursor": next_cursor},
+            )
+        return bytes(response.body), cacheable
+
+    return await cached_response(request, "home", render, "text/html; charset=utf-8")
+
+async def with_clusters(articles: list[dict]) -> list[dict]:
+    """
+    Añade a cada artículo las coberturas de otras fuentes agrupadas con él ('cluster').
     """
+    if not NEAR_DUP_ENABLED:
+        return articles
     try:
-        # Seleccionamos todas las entradas de la tabla 'articles' ordenadas por fecha (desc) y fuente (asc)
-        response = supabase.table("articles").select("*").order("date", desc=True).order("source", desc=False).execute()
-        # El cliente de Supabase devuelve los datos en response.data
-        articles = getattr(response, 'data', [])
-        print(f"Artículos encontrados: {len(articles)}")
+        return await asyncio.to_thread(attach_members, articles)
     except Exception as e:
-        articles = []
-        print(f"Error al recuperar datos de Supabase: {e}")
-    return templates.TemplateResponse("index.html", {"request": request, "articles": articles})
+        print(f"Error al cargar los grupos de casi-duplicados: {e}")
+        return articles
+
+def _query_key(prefix: str, request: Request) -> str:
+    return prefix + "?" + urlencode(sorted(request.query_params.multi_items()))
 
-@app.post("/update/news")
-async def update_news():
+@app.get("/api/articles")
+async def list_articles(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(ARTICLES_PAGE_SIZE, ge=1, le=ARTICLES_MAX_PAGE_SIZE),
+    source: str | None = None,
+    category: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    q: str | None = None,
+):
     """
-    Endpoint para actualizar la base de datos con nuevas noticias de TechCrunch y The Verge.
+    Devuelve una página de artículos en JSON con filtros aplicados en el servidor.
+    `next_cursor` se pasa como `cursor` para pedir la página siguiente.
     """
-    # Verificar si ya existen noticias para hoy
-    if check_articles_exist_today("TheVerge"):
-        return JSONResponse(
-            content={"message": "Ya existen noticias para la fecha actual", "source": "news", "updated": False}, 
-            status_code=201
-        )
-    
-    async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
-        deps = Deps(client=client)
+    async def build() -> tuple[bytes, bool]:
         try:
-            added = await scrape_news(deps)
-            return JSONResponse(content={"message": f"Se han añadido {added} noticias", "source": "news", "updated": True}, status_code=200)
+            articles, next_cursor = await fetch_articles_page(
+                cursor=cursor,
+                limit=limit,
+                source=source,
+                category=category,
+                date_from=date_from.isoformat() if date_from else None,
+                date_to=date_to.isoformat() if date_to else None,
+                q=q.strip() if q else None,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al actualizar noticias: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error al recuperar artículos: {str(e)}")
+        articles = await with_clusters(articles)
+        return bytes(JSONResponse({"articles": articles, "next_cursor": next_cursor}).body), True
+
+    return await cached_response(request, _query_key("articles", request), build, "application/json")
 
-@app.post("/update/arxiv")
-async def update_arxiv():
+@app.get("/api/search")
+async def search(request: Request, q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)):
     """
-    Endpoint para actualizar la base de datos con nuevos papers de arXiv.
+    Búsqueda de texto completo sobre título y resumen, ordenada por relevancia.
+    Admite prefijos: "regul" encuentra "regulación" y "regulation".
     """
-    # Verificar si ya existen papers de arXiv para hoy
-    if check_articles_exist_today("arXiv"):
-        return JSONResponse(
-            content={"message": "Ya existen papers de arXiv para la fecha actual", "source": "arxiv", "updated": False}, 
-            status_code=201
-        )
-    
-    async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
-        deps = Deps(client=client)
+    async def build() -> tuple[bytes, bool]:
         try:
-            added = await scrape_arxiv(deps)
-            if added == 0:
-                return JSONResponse(content={"message": "No se ha encontrado nuevos papers a insertar", "source": "arxiv", "updated": False}, status_code=201)
-            return JSONResponse(content={"message": f"Se han añadido {added} papers de arXiv", "source": "arxiv", "updated": True}, status_code=200)
+            articles = await search_articles(q, limit)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al actualizar papers de arXiv: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error al buscar artículos: {str(e)}")
+        articles = await with_clusters(articles)
+        return bytes(JSONResponse({"articles": articles}).body), True
+
+    return await cached_response(request, _query_key("search", request), build, "application/json")
 
-@app.post("/update/youtube")
-async def update_youtube():
+def enqueue_update(name: str) -> dict:
     """
-    Endpoint para actualizar la base de datos con nuevos videos de YouTube.
+    Encola la actualización de una fuente (o reutiliza la que ya esté en curso) y devuelve
+    la información del trabajo para la respuesta.
     """
-    # Verificar si ya existen videos de YouTube para hoy
-    if check_articles_exist_today("YouTube"):
-        return JSONResponse(
-            content={"message": "Ya existen videos de YouTube para la fecha actual", "source": "youtube", "updated": False}, 
-            status_code=201
-        )
-    
-    async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
-        deps = Deps(client=client)
-        try:
-            added = await scrape_youtube(deps)
-            if added == 0:
-                return JSONResponse(content={"message": "No se ha encontrado nuevos videos a insertar", "source": "youtube", "updated": False}, status_code=201)
-            return JSONResponse(content={"message": f"Se han añadido {added} videos de YouTube", "source": "youtube", "updated": True}, status_code=200)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al actualizar videos de YouTube: {str(e)}")
+    source = get_source(name)
+    job, coalesced = get_job_manager().submit(name, partial(run_source, source))
+    if coalesced:
+        message = f"Ya hay una actualización de {source.label} en curso"
+    else:
+        message = f"Actualización de {source.label} encolada"
+    return {"message": message, "source": name, "job_id": job.id, "status": job.status, "coalesced": coalesced}
 
 @app.post("/update/all")
 async def update_all():
     """
     Endpoint para actualizar la base de datos con contenido de todas las fuentes.
-    Ejecuta todos los scrapers de forma paralela para mejorar el rendimiento.
+    Encola un trabajo por cada fuente pendiente; los workers los ejecutan en paralelo.
     """
     # Verificar qué fuentes necesitan actualización
-    news_exists = check_articles_exist_today("TheVerge")
-    arxiv_exists = check_articles_exist_today("arXiv")
-    youtube_exists = check_articles_exist_today("YouTube")
-    
-    sources_to_update = []
-    skipped_sources = []
+    sources = get_sources()
+    names = list(sources)
+    exists = await asyncio.gather(
+        *(check_articles_exist_today(sources[name].check_source) for name in names)
+    )
+    skipped_sources = [name for name, already in zip(names, exists) if already]
+    sources_to_update = [name for name, already in zip(names, exists) if not already]
 
-    if news_exists:
-        skipped_sources.append("news")
-    else:
-        sources_to_update.append("news")
-        
-    if arxiv_exists:
-        skipped_sources.append("arxiv")
-    else:
-        sources_to_update.append("arxiv")
-        
-    if youtube_exists:
-        skipped_sources.append("youtube")
-    else:
-        sources_to_update.append("youtube")
-    
     # Si todas las fuentes ya están actualizadas
     if not sources_to_update:
         return JSONResponse(
@@ -179,37 +213,91 @@ async def update_all():
             },
             status_code=201
         )
-    
-    # Actualizar solo las fuentes que lo necesitan
-    async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
-        try:
-            tasks = []
-            deps = Deps(client=client)       
-            if "news" in sources_to_update:
-                tasks.append(scrape_news(deps))
-                
-            if "arxiv" in sources_to_update:
-                tasks.append(scrape_arxiv(deps))
-                
-            if "youtube" in sources_to_update:
-                tasks.append(scrape_youtube(deps))
-
-            # Ejecutar tareas en paralelo
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-            
-            return JSONResponse(
-                content={
-                    "message": f"Actualización completada. Fuentes actualizadas: {sources_to_update}",
-                    "updated_sources": sources_to_update,
-                    "skipped_sources": skipped_sources,
-                    "updated": True
-                },
-                status_code=200
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error al actualizar todas las fuentes: {str(e)}")
+
+    jobs = {name: enqueue_update(name) for name in sources_to_update}
+    return JSONResponse(
+        content={
+            "message": f"Actualización encolada. Fuentes a actualizar: {sources_to_update}",
+            "updated_sources": sources_to_update,
+            "skipped_sources": skipped_sources,
+            "jobs": jobs,
+            "updated": False
+        },
+        status_code=202
+    )
+
+@app.post("/update/{name}")
+async def update_source(name: str):
+    """
+    Endpoint para actualizar la base de datos con una fuente registrada (news, arxiv, youtube
+    o cualquiera añadida en sources.toml). Encola el trabajo y responde al momento con su id;
+    el progreso se consulta en /jobs/{id}.
+    """
+    source = get_source(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail=f"Fuente desconocida: {name}")
+    # Verificar si ya existen artículos de la fuente para hoy
+    if await check_articles_exist_today(source.check_source):
+        return JSONResponse(
+            content={"message": f"Ya existen {source.label} para la fecha actual", "source": name, "updated": False},
+            status_code=201
+        )
+    return JSONResponse(content={**enqueue_update(name), "updated": False}, status_code=202)
+
+@app.post("/reenrich")
+async def reenrich():
+    """
+    Encola el re-enriquecimiento de los artículos guardados con un resumen provisional
+    mientras el LLM no estaba disponible (también lo lanza el planificador).
+    """
+    job, coalesced = get_job_manager().submit(REENRICH_JOB, reenrich_degraded)
+    message = "Ya hay un re-enriquecimiento en curso" if coalesced else "Re-enriquecimiento encolado"
+    return JSONResponse(
+        content={"message": message, "job_id": job.id, "status": job.status, "coalesced": coalesced},
+        status_code=202
+    )
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    Estado y progreso (artículos obtenidos, descartados, enriquecidos e insertados) de un trabajo.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job.to_dict()
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Métricas del proceso en formato Prometheus: latencia por etapa y fuente, artículos,
+    llamadas y tokens del LLM, aciertos de las cachés y viajes a la base de datos.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, last_event_id: str | None = Header(default=None)):
+    """
+    Server-Sent Events de un trabajo: un evento `article` por cada artículo en cuanto se
+    inserta, `progress` con los contadores y `done` con el estado final. El dashboard los usa
+    para añadir las filas nuevas sin recargar la página. Cada `article` lleva su posición como
+    `id`, de modo que al reconectar (Last-Event-ID) solo se envían los artículos que faltan.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def stream():
+        async for event, data, event_id in job.events(after):
+            id_line = f"id: {event_id}\n" if event_id is not None else ""
+            yield f"{id_line}event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 async def main():
         uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,142 @@
+# metrics.py: Métricas del proceso (contadores e histogramas en formato Prometheus) y spans por etapa de la ingesta.
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logfire
+
+# Qué se registra de cada petición HTTP saliente: off (nada) | spans (solo duración y estado) |
+# headers (también cabeceras) | all (también cuerpos; caro, solo para depurar)
+HTTPX_CAPTURE = os.getenv("HTTPX_CAPTURE", "spans")
+# Límites (segundos) de los histogramas de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Fuente que se está ingiriendo; la fija run_source y la heredan las tareas que lanza
+current_source: ContextVar[str] = ContextVar("current_source", default="")
+
+_metrics: list["Counter | Histogram"] = []
+
+
+def _labels_text(names: tuple[str, ...], values: tuple) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels_text(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Por combinación de etiquetas: [cuenta por cubeta..., suma, total]
+        self.values: dict[tuple, list[float]] = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        data = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.values.items()):
+            names = (*self.labels, "le")
+            for bound, count in zip(self.buckets, data):
+                lines.append(f"{self.name}_bucket{_labels_text(names, (*key, f'{bound:g}'))} {count}")
+            lines.append(f"{self.name}_bucket{_labels_text(names, (*key, '+Inf'))} {data[-1]}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labels, key)} {data[-2]:g}")
+            lines.append(f"{self.name}_count{_labels_text(self.labels, key)} {data[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "ia_newsletter_stage_seconds",
+    "Duración de cada etapa (fetch, parse, dedup, summarize, enrich, insert, ingest, render) por fuente.",
+    ("stage", "source"),
+)
+ARTICLES = Counter(
+    "ia_newsletter_articles_total",
+    "Artículos por fuente y resultado (fetched, duplicate, inserted).",
+    ("source", "outcome"),
+)
+LLM_CALLS = Counter("ia_newsletter_llm_calls_total", "Llamadas al LLM por agente y resultado.", ("agent", "outcome"))
+LLM_TOKENS = Counter(
+    "ia_newsletter_llm_tokens_total",
+    "Tokens del LLM por agente y tipo (estimated, input, output).",
+    ("agent", "kind"),
+)
+CACHE_LOOKUPS = Counter(
+    "ia_newsletter_cache_lookups_total",
+    "Consultas a las cachés (llm, response, feed) por resultado (hit, miss).",
+    ("cache", "result"),
+)
+DB_ROUND_TRIPS = Counter(
+    "ia_newsletter_db_round_trips_total",
+    "Viajes de ida y vuelta a la base de datos por backend y operación.",
+    ("backend", "operation"),
+)
+
+
+@contextmanager
+def stage(name: str, source: str | None = None, **attributes):
+    """
+    Span de logfire y observación en STAGE_SECONDS para una etapa. La fuente por defecto es
+    la de la ingesta en curso (current_source).
+    """
+    source = current_source.get() if source is None else source
+    started = time.perf_counter()
+    with logfire.span("{stage} {source}", stage=name, source=source, **attributes):
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage=name, source=source)
+
+
+def render_metrics() -> str:
+    """
+    Todas las métricas en el formato de texto de Prometheus.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def instrument_client(client) -> None:
+    """
+    Instrumenta un cliente httpx con logfire según HTTPX_CAPTURE.
+    """
+    if HTTPX_CAPTURE == "off":
+        return
+    logfire.instrument_httpx(
+        client,
+        capture_headers=HTTPX_CAPTURE in ("headers", "all"),
+        capture_request_body=HTTPX_CAPTURE == "all",
+        capture_response_body=HTTPX_CAPTURE == "all",
+    )
@@ -0,0 +1,165 @@
+# response_cache.py: Caché de respuestas del dashboard y del listado de artículos, invalidada en cada ingesta.
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Awaitable, Callable
+from starlette.requests import Request
+from starlette.responses import Response
+from metrics import CACHE_LOOKUPS
+
+try:
+    import redis.asyncio as redis_asyncio  # Opcional: solo con RESPONSE_CACHE_REDIS_URL
+except ImportError:
+    redis_asyncio = None
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+# Caducidad de seguridad por si la tabla cambia fuera de la aplicación (otro proceso sin Redis,
+# p. ej. scheduler.py): cada RESPONSE_CACHE_TTL segundos cambian los ETag y se regeneran las respuestas
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+# Backend compartido entre procesos (varios workers de uvicorn): guarda la versión y la fecha de cambio
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL")
+
+_REDIS_VERSION_KEY = "ia_newsletter:articles:version"
+_REDIS_MODIFIED_KEY = "ia_newsletter:articles:modified"
+
+
+class ResponseCache:
+    """
+    Caché en memoria de cuerpos de respuesta. Cada entrada se guarda con la etiqueta (versión,
+    fecha de modificación) vigente al generarla; `invalidate()` sube la versión y el paso de
+    cada ventana de `ttl` segundos adelanta la fecha, de modo que las entradas antiguas dejan
+    de servirse y los ETag cambian.
+    """
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL,
+                 redis_url: str | None = RESPONSE_CACHE_REDIS_URL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = 0
+        self.last_modified = time.time()
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self._redis = None
+        if redis_url:
+            if redis_asyncio is None:
+                print("RESPONSE_CACHE_REDIS_URL definido pero el paquete 'redis' no está instalado; se usa solo memoria")
+            else:
+                self._redis = redis_asyncio.from_url(redis_url)
+
+    async def state(self) -> tuple[int, float]:
+        """
+        Devuelve la versión del contenido y su fecha de modificación (epoch): la de la última
+        ingesta o, si es posterior, el inicio de la ventana de caducidad en curso.
+        """
+        if self._redis is not None:
+            try:
+                version, modified = await self._redis.mget(_REDIS_VERSION_KEY, _REDIS_MODIFIED_KEY)
+                if version is not None:
+                    self.version = int(version)
+                    self.last_modified = float(modified or self.last_modified)
+            except Exception as e:
+                print(f"Error al leer la versión de la caché compartida: {e}")
+        modified = self.last_modified
+        if self.ttl > 0:
+            modified = max(modified, time.time() // self.ttl * self.ttl)
+        return self.version, modified
+
+    async def invalidate(self) -> None:
+        """
+        Marca el contenido como modificado: descarta las entradas y cambia los ETag.
+        """
+        self.version += 1
+        self.last_modified = time.time()
+        self._entries.clear()
+        if self._redis is not None:
+            try:
+                self.version = await self._redis.incr(_REDIS_VERSION_KEY)
+                await self._redis.set(_REDIS_MODIFIED_KEY, self.last_modified)
+            except Exception as e:
+                print(f"Error al invalidar la caché compartida: {e}")
+
+    def get(self, key: str, tag: tuple[int, int]) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != tag:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache="response", result="miss")
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.inc(cache="response", result="hit")
+        return entry[1]
+
+    def set(self, key: str, tag: tuple[int, int], body: bytes) -> None:
+        self._entries[key] = (tag, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+async def invalidate_responses() -> None:
+    """
+    Llamar cuando se insertan artículos nuevos o cambian los grupos de casi-duplicados.
+    """
+    await get_response_cache().invalidate()
+
+
+def _not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def cached_response(
+    request: Request,
+    key: str,
+    build: Callable[[], Awaitable[tuple[bytes, bool]]],
+    media_type: str,
+) -> Response:
+    """
+    Sirve `key` desde la caché con ETag/Last-Modified y responde 304 si el cliente ya
+    tiene la versión vigente. `build` genera el cuerpo e indica si se puede cachear
+    (por ejemplo, no se cachea una página renderizada tras un error de la base de datos).
+    """
+    cache = get_response_cache()
+    version, last_modified = await cache.state()
+    # Las plantillas generan URLs absolutas (url_for) con el host de la petición
+    key = f"{request.base_url}{key}"
+    tag = (version, int(last_modified))
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    # La fecha entra en el ETag para que un reinicio (versión 0 de nuevo) no reutilice ETags
+    # antiguos y para que caduquen con la ventana de RESPONSE_CACHE_TTL
+    etag = f'W/"{version}-{int(last_modified)}-{digest}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = cache.get(key, tag)
+    if body is None:
+        body, cacheable = await build()
+        if not cacheable:
+            return Response(body, media_type=media_type)
+        cache.set(key, tag, body)
+    return Response(body, media_type=media_type, headers=headers)
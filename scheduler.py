@@ -0,0 +1,117 @@
+# scheduler.py: Planificador en proceso que actualiza cada fuente periódicamente a través de la cola de trabajos.
+import argparse
+import asyncio
+import os
+import random
+import sys
+from functools import partial
+from dotenv import load_dotenv
+import logfire
+from agent.reenrich import REENRICH_JOB, reenrich_degraded
+from agent.registry import close_models
+from jobs import Job, JobManager, Runner, get_job_manager
+from db.storage import close_store
+from response_cache import RESPONSE_CACHE_REDIS_URL, RESPONSE_CACHE_TTL
+from scraper.sources import get_sources, run_source, schedule_interval
+
+load_dotenv()
+
+# Activa el planificador dentro de la aplicación FastAPI (main.py). Con varios workers de
+# uvicorn, activarlo solo en uno o usar el worker independiente (python scheduler.py).
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "0") == "1"
+# Variación aleatoria de cada intervalo (fracción), para no lanzar todas las fuentes a la vez
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+
+
+def next_delay(interval: float, jitter: float = SCHEDULER_JITTER) -> float:
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+def job_names() -> list[str]:
+    """
+    Trabajos programados: cada fuente registrada y el re-enriquecimiento de artículos degradados.
+    """
+    return [*get_sources(), REENRICH_JOB]
+
+
+def job_runner(name: str) -> Runner:
+    if name == REENRICH_JOB:
+        return reenrich_degraded
+    return partial(run_source, get_sources()[name])
+
+
+class Scheduler:
+    """
+    Lanza cada trabajo (job_names) cada `schedule_interval(name)` segundos (± jitter). Cada
+    ejecución se encola en el JobManager, que no permite dos trabajos activos de la misma
+    fuente: si una actualización manual sigue en curso, el planificador espera a que termine.
+    El siguiente intervalo se cuenta desde el final de la ejecución anterior.
+    """
+    def __init__(self, manager: JobManager):
+        self.manager = manager
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._loop(name)) for name in job_names()]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_now(self, name: str) -> Job:
+        job, coalesced = self.manager.submit(name, job_runner(name))
+        if coalesced:
+            print(f"Programada: {name} ya estaba en curso ({job.id}), se espera a que termine")
+        await job.wait()
+        print(f"Programada: {name} terminada con estado {job.status} ({job.added or 0} nuevos)")
+        return job
+
+    async def _loop(self, name: str) -> None:
+        interval = schedule_interval(name)
+        # Primera ejecución escalonada dentro del margen de jitter
+        await asyncio.sleep(random.uniform(0, interval * SCHEDULER_JITTER))
+        while True:
+            try:
+                await self.run_now(name)
+            except Exception as e:
+                print(f"Error en la ejecución programada de {name}: {e}")
+            await asyncio.sleep(next_delay(interval))
+
+
+async def run_worker(once: bool) -> bool:
+    """
+    Worker independiente de larga duración: mantiene los clientes y agentes entre ejecuciones.
+    Con `once`, actualiza todas las fuentes una vez y devuelve si todas terminaron sin error.
+    """
+    if not RESPONSE_CACHE_REDIS_URL:
+        print("Sin RESPONSE_CACHE_REDIS_URL, el servidor web no ve los artículos que inserta este worker "
+              f"hasta que caduca su caché (RESPONSE_CACHE_TTL={RESPONSE_CACHE_TTL:g} s)")
+    manager = get_job_manager()
+    manager.start()
+    scheduler = Scheduler(manager)
+    try:
+        if once:
+            jobs = await asyncio.gather(*(scheduler.run_now(name) for name in job_names()))
+            return all(job.status == "done" for job in jobs)
+        else:
+            scheduler.start()
+            await asyncio.Event().wait()
+        return True
+    finally:
+        await scheduler.stop()
+        await manager.stop()
+        await close_store()
+        await close_models()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actualiza periódicamente las fuentes de artículos")
+    parser.add_argument("--once", action="store_true", help="actualizar todas las fuentes una vez y salir")
+    args = parser.parse_args()
+    logfire.configure(send_to_logfire='if-token-present')
+    logfire.instrument_pydantic_ai()
+    ok = asyncio.run(run_worker(args.once))
+    sys.exit(0 if ok else 1)
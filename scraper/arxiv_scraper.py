@@ -1,19 +1,19 @@
-# scraper/arxiv_scraper.py: Módulo para obtener los últimos papers de arXiv sobre IA.
+# scraper/arxiv_scraper.py: Módulo para recolectar de forma incremental los papers de arXiv sobre IA.
 import sys
 import os
 # Agregar el directorio padre al path para permitir importaciones relativas
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import feedparser
-from agent.summarizer import summarize, Deps as SummarizerDeps
-from agent.classifier import classify, Deps as ClassifierDeps
-from db.supabase_client import SupabaseClient
+from db.storage import close_store
+from metrics import instrument_client
+from scraper.feed_cache import download_feed, fetch_feed_if_changed, get_feed_cache
+from scraper.sources import Collected, Source, register_source, run_source
 from httpx import AsyncClient
 from dotenv import load_dotenv
-from shared_definitions import Deps, upload_data
+from shared_definitions import Deps, RateLimiter
 import asyncio
-import logfire
 import ssl
+from urllib.parse import urlencode
 
 # Configurar SSL para ignorar verificación de certificados (solo para desarrollo)
 ssl_context = ssl.create_default_context()
@@ -22,90 +22,185 @@ ssl_context.verify_mode = ssl.CERT_NONE
 
 load_dotenv()
 
-async def scrape_arxiv(ctx: Deps)-> int:
+# Pausa entre peticiones HTTP a la API de arXiv: su documentación pide al menos 3 segundos
+# (no afecta a las llamadas al LLM)
+ARXIV_REQUEST_DELAY = float(os.getenv("ARXIV_REQUEST_DELAY", "3"))
+arxiv_rate_limiter = RateLimiter(ARXIV_REQUEST_DELAY)
+
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_CATEGORIES = [c.strip() for c in os.getenv("ARXIV_CATEGORIES", "cs.AI,cs.LG,cs.CL").split(",") if c.strip()]
+# Papers por petición y tope por ejecución (también limita la carga inicial sin marca de agua)
+ARXIV_PAGE_SIZE = int(os.getenv("ARXIV_PAGE_SIZE", "100"))
+ARXIV_MAX_RESULTS = int(os.getenv("ARXIV_MAX_RESULTS", "500"))
+ARXIV_ATTEMPTS = 2
+# Nombre de la marca de agua en scraper/feed_cache.py
+ARXIV_MARK = "arxiv:" + ",".join(ARXIV_CATEGORIES)
+
+
+def submitted_minute(published: str) -> str:
+    """
+    Fecha de publicación de arXiv (2024-05-01T17:59:59Z) en el formato de submittedDate (202405011759).
+    """
+    return published[:16].replace("-", "").replace("T", "").replace(":", "")
+
+
+def arxiv_query_url(start: int, max_results: int, submitted: tuple[str, str] | None = None) -> str:
+    """
+    URL de una página de la consulta a arXiv, ordenada por fecha de envío descendente.
+    Con `submitted` (fechas de publicación, ambas incluidas al minuto) se limita a ese intervalo.
+    """
+    query = " OR ".join(f"cat:{category}" for category in ARXIV_CATEGORIES)
+    if submitted is not None:
+        low, high = submitted
+        query = f"({query}) AND submittedDate:[{submitted_minute(low)} TO {submitted_minute(high)}]"
+    params = {
+        "search_query": query,
+        "start": start,
+        "max_results": max_results,
+        "sortBy": "submittedDate",
+        "sortOrder": "descending",
+    }
+    return f"{ARXIV_API_URL}?{urlencode(params)}"
+
+
+async def fetch_arxiv_page(ctx: Deps, start: int, conditional: bool, submitted: tuple[str, str] | None = None):
+    """
+    Descarga una página con un intento y un reintento, respetando la pausa de arXiv antes de
+    cada petición. La primera página se pide de forma condicional (ver scraper/feed_cache.py).
+    Devuelve un FeedFetch si `conditional`, el feed parseado si no, o None si falla.
+    """
+    url = arxiv_query_url(start, ARXIV_PAGE_SIZE, submitted)
+    print(f"Consultando URL: {url}")
+    for attempt in range(ARXIV_ATTEMPTS):
+        try:
+            await arxiv_rate_limiter.wait()
+            if conditional:
+                return await fetch_feed_if_changed(ctx, url, timeout=30)
+            return await download_feed(ctx, url, timeout=30)
+        except Exception as e:
+            print(f"Error al hacer petición: {e}")
+        if attempt < ARXIV_ATTEMPTS - 1:
+            print("Reintentando la consulta a arXiv...")
+    return None
+
+
+def published(entry) -> str:
+    return entry.get("published", "")
+
+
+async def harvest(ctx: Deps, feed, floor: str | None, limit: int,
+                  submitted: tuple[str, str] | None = None) -> tuple[list, bool]:
     """
-    Busca los últimos papers en arXiv de la categoría cs.AI y los procesa.
+    Pagina desde `feed` (primera página de la consulta) hasta llegar a papers anteriores a
+    `floor`. Los papers con la misma fecha que `floor` se vuelven a considerar: los ya
+    guardados los descarta drop_known_items. Devuelve como mucho `limit` papers y si se ha
+    llegado hasta `floor` (o al final) sin cortar por el tope ni por un error.
     """
-    client = SupabaseClient()
-    
-    # Usar HTTPS en lugar de HTTP para evitar redirects
-    base_url = 'https://export.arxiv.org/api/query?'
-    search_query = 'cat:cs.AI'  # Volver a la categoría original que debería funcionar
-    max_results = 5# Reducir para testing y respeto del rate limit
-    query = f'search_query={search_query}&start=0&max_results={max_results}&sortBy=submittedDate&sortOrder=descending'
-    
-    # Construir URL completa
-    full_url = base_url + query
-    print(f"Consultando URL: {full_url}")
-    
-    try:
-        # Hacer petición HTTP directa con httpx
-        response = await ctx.client.get(full_url)
-        print(f"Status code: {response.status_code}")
-        
-        if response.status_code == 200:
-            # Parsear usando feedparser con el contenido obtenido
-            feed = feedparser.parse(response.text)
-            print(f"Encontrados {len(feed.entries)} papers de arXiv")
-        else:
-            print(f"Error en la petición HTTP: {response.status_code}")
-            # Fallback a feedparser directo
-            feed = feedparser.parse(full_url)
-            print(f"Fallback feedparser: {len(feed.entries)} papers")
-            
-    except Exception as e:
-        print(f"Error al hacer petición: {e}")
-        # Fallback a feedparser directo
-        print("Probando con feedparser directo...")
-        feed = feedparser.parse(full_url)
-        print(f"Con feedparser directo: {len(feed.entries)} papers")
-    
-    print(f"Encontrados {len(feed.entries)} papers de arXiv")
-    
-    # Crear contextos para summarizer y classifier
-    summarizer_ctx = SummarizerDeps(client=ctx.client)
-    classifier_ctx = ClassifierDeps(client=ctx.client)
-    
-    añadidos=0
-    # Iterar sobre las entradas del feed
-    for entry in feed.entries:
+    entries = []
+    start = 0
+    while feed is not None:
+        page = [entry for entry in feed.entries if floor is None or published(entry) >= floor]
+        entries.extend(page)
+        # Página incompleta o con papers anteriores a la marca: no hay más que recoger
+        if len(page) < ARXIV_PAGE_SIZE:
+            return entries[:limit], len(entries) <= limit
+        if len(entries) >= limit:
+            return entries[:limit], False
+        start += ARXIV_PAGE_SIZE
+        feed = await fetch_arxiv_page(ctx, start, conditional=False, submitted=submitted)
+    print(f"Se detiene la paginación de arXiv en start={start}")
+    return entries[:limit], False
+
+
+async def collect_arxiv(ctx: Deps) -> Collected | None:
+    """
+    Recolecta de forma incremental los papers de arXiv de las categorías configuradas:
+    pagina desde el más reciente hasta alcanzar la marca de agua de la última ejecución,
+    con un tope de ARXIV_MAX_RESULTS por ejecución. Si el tope (o un error) corta la
+    paginación, el intervalo entre la marca anterior y el paper más antiguo recogido queda
+    como hueco en la marca ('gaps'), y las siguientes ejecuciones lo recorren con consultas
+    por fecha con el presupuesto que sobre, hasta vaciarlo.
+    """
+    cache = get_feed_cache()
+    mark = cache.get_mark(ARXIV_MARK) or {}
+    floor = mark.get("published")
+    gaps = [tuple(gap) for gap in mark.get("gaps", [])]
+
+    first = await fetch_arxiv_page(ctx, 0, conditional=True)
+    if first is None:
+        raise RuntimeError("No se ha podido obtener el feed de arXiv")
+    if not first.changed and not gaps:
+        return None
+
+    entries = []
+    new_mark = dict(mark)
+    if first.changed:
+        entries, complete = await harvest(ctx, first.feed, floor, ARXIV_MAX_RESULTS)
+        if entries:
+            newest = max(entries, key=published)
+            new_mark.update(published=published(newest), id=newest.get("id", ""))
+            # Sin marca previa (carga inicial) no hay hueco: el tope limita el histórico a propósito
+            if not complete and floor is not None:
+                gaps.append((floor, published(min(entries, key=published))))
+
+    remaining = []
+    for low, high in gaps:
+        budget = ARXIV_MAX_RESULTS - len(entries)
+        feed = await fetch_arxiv_page(ctx, 0, conditional=False, submitted=(low, high)) if budget > 0 else None
+        if feed is None:
+            remaining.append((low, high))
+            continue
+        part, complete = await harvest(ctx, feed, low, budget, submitted=(low, high))
+        entries.extend(part)
+        if not complete:
+            remaining.append((low, published(min(part, key=published)) if part else high))
+    new_mark["gaps"] = remaining
+    print(f"Encontrados {len(entries)} papers de arXiv posteriores a la última ejecución"
+          + (f" ({len(remaining)} huecos pendientes)" if remaining else ""))
+
+    items = []
+    for entry in entries:
         title = entry.get('title', 'Sin título')
-        summary_text = entry.get('summary', 'Nada que resumir')  
+        summary_text = entry.get('summary', 'Nada que resumir')
         link = entry.get('link', 'No link available')
         date = entry.get('published', 'No date available')
         date = date.split('T')[0] # type: ignore
-        print(title)
-        print(link)
-        print(summary_text[:50]) # type: ignore
-        print(f"Procesando: {title[:50]}...") # type: ignore
-        
-        # Llamar al agente para resumir y clasificar
-        summary = await summarize(summary_text, summarizer_ctx) # type: ignore
-        category = await classify(summary_text, classifier_ctx) # type: ignore
-        data = {
+        items.append({
             "source": "arXiv",
             "title": title,
-            "summary": summary,
-            "category": category,
             "url": link,
             "date": date,
-        }
-        # Insertar en Supabase
-        if upload_data(data):
-            print(f"✓ Insertado correctamente: {title[:30]}...") # type: ignore
-            añadidos+=1
-        else:
-            print(f"✗ No insertado (posible duplicado): {title[:30]}...") # type: ignore
-        # Delay para respetar rate limits de la API
-        await asyncio.sleep(5)  # 5 segundos entre requests
-    return añadidos
+            "text": summary_text,
+        })
+
+    def save() -> None:
+        # La marca (y los huecos) avanzan solo cuando la ingesta ha terminado
+        if first.changed:
+            first.save()
+        if new_mark:
+            cache.set_mark(ARXIV_MARK, new_mark)
+
+    return Collected(items=items, on_success=save)
+
+
+SOURCE = register_source(Source(name="arxiv", label="papers de arXiv", check_source="arXiv", collect=collect_arxiv))
+
+
+async def scrape_arxiv(ctx: Deps)-> int:
+    """
+    Busca los papers nuevos de arXiv y los procesa.
+    """
+    return await run_source(SOURCE, ctx)
 
 async def main():
     async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
+        instrument_client(client)
         deps = Deps(client=client)
-        result = await scrape_arxiv(ctx=deps)
-        print(result)
+        try:
+            result = await scrape_arxiv(ctx=deps)
+            print(result)
+        finally:
+            await close_store()
 
 if __name__ == "__main__":
     print("Iniciando scraper de arXiv...")
@@ -0,0 +1,169 @@
+# scraper/feed_cache.py: Peticiones condicionales (ETag / If-Modified-Since) y registro de las entradas ya vistas por feed.
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from metrics import CACHE_LOOKUPS, stage
+from shared_definitions import Deps
+
+FEED_CACHE_PATH = os.getenv("FEED_CACHE_PATH", os.path.join(".cache", "feed_cache.sqlite3"))
+
+
+@dataclass
+class FeedState:
+    etag: str | None = None
+    last_modified: str | None = None
+    entry_ids: list[str] = field(default_factory=list)
+
+
+class FeedCache:
+    """
+    Guarda por URL las cabeceras de validación de la última descarga y los ids de sus entradas.
+    """
+    def __init__(self, path: str = FEED_CACHE_PATH):
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_state ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " entry_ids TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS harvest_marks ("
+            " name TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, url: str) -> FeedState | None:
+        row = self._conn.execute(
+            "SELECT etag, last_modified, entry_ids FROM feed_state WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return FeedState(etag=row[0], last_modified=row[1], entry_ids=json.loads(row[2]))
+
+    def set(self, url: str, state: FeedState) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO feed_state (url, etag, last_modified, entry_ids, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (url, state.etag, state.last_modified, json.dumps(state.entry_ids), time.time()),
+        )
+        self._conn.commit()
+
+    def get_mark(self, name: str) -> dict | None:
+        """
+        Marca de agua de una recolección incremental (por ejemplo, el último paper procesado).
+        """
+        row = self._conn.execute("SELECT value FROM harvest_marks WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_mark(self, name: str, value: dict) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO harvest_marks (name, value, updated_at) VALUES (?, ?, ?)",
+            (name, json.dumps(value), time.time()),
+        )
+        self._conn.commit()
+
+
+_cache: FeedCache | None = None
+
+
+def get_feed_cache() -> FeedCache:
+    """
+    Devuelve el registro compartido del proceso, abriéndolo la primera vez.
+    """
+    global _cache
+    if _cache is None:
+        _cache = FeedCache()
+    return _cache
+
+
+def entry_ids(feed) -> list[str]:
+    """
+    Identificadores de las entradas del feed (id/guid, o el enlace si el feed no lo trae).
+    """
+    return [entry.get("id") or entry.get("link") or entry.get("title", "") for entry in feed.entries]
+
+
+@dataclass
+class FeedFetch:
+    url: str
+    status: str  # changed | not_modified | unchanged | error
+    feed: object | None = None
+    state: FeedState | None = None
+
+    @property
+    def changed(self) -> bool:
+        return self.status == "changed"
+
+    def save(self) -> None:
+        """
+        Registra la descarga como procesada. Se llama solo cuando la ingesta ha terminado,
+        para que un fallo a medio camino vuelva a procesar el feed en la siguiente ejecución.
+        """
+        if self.changed and self.state is not None:
+            get_feed_cache().set(self.url, self.state)
+
+
+def parse_feed(content: bytes):
+    """
+    Parsea el feed con feedparser, que se importa aquí para que no lo paguen los procesos
+    que no leen feeds.
+    """
+    import feedparser
+    return feedparser.parse(content)
+
+
+async def download_feed(ctx: Deps, url: str, **kwargs):
+    """
+    Descarga y parsea el feed sin petición condicional. Los errores HTTP lanzan excepción.
+    """
+    with stage("fetch", url=url):
+        response = await ctx.client.get(url, follow_redirects=True, **kwargs)
+    response.raise_for_status()
+    with stage("parse", url=url):
+        return await asyncio.to_thread(parse_feed, response.content)
+
+
+async def fetch_feed_if_changed(ctx: Deps, url: str, **kwargs) -> FeedFetch:
+    """
+    Descarga el feed con una petición condicional. Un 304 (sin cuerpo ni parseo), o un feed
+    cuyas entradas son las mismas que en la última ejecución, devuelve un resultado sin
+    cambios y sin feed. Los errores HTTP lanzan excepción.
+    """
+    previous = get_feed_cache().get(url)
+    headers = {}
+    if previous is not None:
+        if previous.etag:
+            headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            headers["If-Modified-Since"] = previous.last_modified
+    with stage("fetch", url=url):
+        response = await ctx.client.get(url, headers=headers, follow_redirects=True, **kwargs)
+    if response.status_code == 304:
+        CACHE_LOOKUPS.inc(cache="feed", result="hit")
+        return FeedFetch(url=url, status="not_modified")
+    response.raise_for_status()
+    # Parsear en un hilo para no bloquear el bucle de eventos
+    with stage("parse", url=url):
+        feed = await asyncio.to_thread(parse_feed, response.content)
+    state = FeedState(
+        etag=response.headers.get("etag"),
+        last_modified=response.headers.get("last-modified"),
+        entry_ids=entry_ids(feed),
+    )
+    if previous is not None and set(state.entry_ids) == set(previous.entry_ids):
+        # Guardar las cabeceras nuevas para que la próxima petición pueda recibir un 304
+        get_feed_cache().set(url, state)
+        CACHE_LOOKUPS.inc(cache="feed", result="hit")
+        return FeedFetch(url=url, status="unchanged")
+    CACHE_LOOKUPS.inc(cache="feed", result="miss")
+    return FeedFetch(url=url, status="changed", feed=feed, state=state)
@@ -0,0 +1,230 @@
+# scraper/sources.py: Registro de fuentes (plugins) y ejecutor común de la ingesta: recoger → deduplicar → enriquecer → subir.
+import asyncio
+import importlib
+import os
+import time
+import tomllib
+from dataclasses import dataclass
+from datetime import date
+from typing import Awaitable, Callable
+from agent.pipeline import drop_known_items, enrich_items
+from metrics import ARTICLES, current_source, stage
+from scraper.feed_cache import FeedFetch, fetch_feed_if_changed
+from shared_definitions import Deps, upload_rows
+
+# Fichero con los feeds RSS y los módulos que registran fuentes propias
+SOURCES_CONFIG = os.getenv(
+    "SOURCES_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources.toml"),
+)
+# Minutos entre ejecuciones programadas (scheduler.py) de las fuentes sin entrada en [schedule]
+SCHEDULE_DEFAULT_MINUTES = float(os.getenv("SCHEDULE_DEFAULT_MINUTES", "60"))
+# Artículos por lote: cada lote se sube mientras se siguen enriqueciendo los demás
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "50"))
+# Segundos como máximo que un artículo enriquecido espera a que se llene su lote mientras
+# alguien sigue el trabajo en el dashboard (ver /jobs/{id}/events)
+INGEST_FLUSH_SECONDS = float(os.getenv("INGEST_FLUSH_SECONDS", "2"))
+
+
+@dataclass
+class Collected:
+    """
+    Resultado de la fase de recogida de una fuente. `items` trae source, title, url, date y el
+    texto a resumir en 'text'; `on_success` se llama cuando la ingesta termina (por ejemplo,
+    para guardar el estado de los feeds) y no se llama si algo falla antes.
+    """
+    items: list[dict]
+    on_success: Callable[[], None] | None = None
+
+
+@dataclass
+class Source:
+    name: str  # nombre en la URL: /update/<name>
+    label: str  # descripción para los mensajes
+    check_source: str  # valor de la columna source con el que se comprueba si ya hay artículos de hoy
+    # Devuelve None si la fuente no ha cambiado desde la última ejecución
+    collect: Callable[[Deps], Awaitable[Collected | None]]
+
+
+_sources: dict[str, Source] = {}
+_schedule: dict[str, float] = {}
+_loaded = False
+
+
+def register_source(source: Source) -> Source:
+    """
+    Registra (o sustituye) una fuente. Los plugins lo llaman al importarse.
+    """
+    _sources[source.name] = source
+    return source
+
+
+def load_sources(path: str = SOURCES_CONFIG) -> None:
+    """
+    Registra los feeds [[rss]] del fichero de configuración, importa los módulos [[plugin]]
+    y lee los intervalos de [schedule].
+    """
+    with open(path, "rb") as f:
+        config = tomllib.load(f)
+    _schedule.update({name: float(minutes) for name, minutes in config.get("schedule", {}).items()})
+    for entry in config.get("rss", []):
+        register_source(rss_source(
+            name=entry["name"],
+            label=entry.get("label", entry["name"]),
+            feeds=entry["feeds"],
+            max_entries=entry.get("max_entries", 5),
+            check_source=entry.get("check_source"),
+        ))
+    for entry in config.get("plugin", []):
+        importlib.import_module(entry["module"])
+
+
+def get_sources() -> dict[str, Source]:
+    """
+    Devuelve las fuentes registradas, cargando la configuración la primera vez.
+    """
+    global _loaded
+    if not _loaded:
+        _loaded = True
+        load_sources()
+    return _sources
+
+
+def get_source(name: str) -> Source | None:
+    return get_sources().get(name)
+
+
+def schedule_interval(name: str) -> float:
+    """
+    Segundos entre ejecuciones programadas de la fuente.
+    """
+    get_sources()
+    return _schedule.get(name, SCHEDULE_DEFAULT_MINUTES) * 60
+
+
+async def _upload_batch(rows: list[dict], ctx: Deps) -> int:
+    with stage("insert", rows=len(rows)):
+        inserted = await upload_rows(rows)
+    added = len(inserted)
+    ctx.stats.inserted += added
+    if inserted and ctx.on_inserted is not None:
+        ctx.on_inserted(inserted)
+    ARTICLES.inc(added, source=current_source.get(), outcome="inserted")
+    return added
+
+
+async def run_source(source: Source, ctx: Deps) -> int:
+    """
+    Ejecuta la ingesta de una fuente y devuelve el número de artículos insertados.
+    La concurrencia del LLM y su límite de peticiones se comparten entre todas las fuentes
+    (ver agent/pipeline.py y agent/registry.py); aquí las filas enriquecidas se suben en lotes
+    de INGEST_BATCH_SIZE (o las que haya cada INGEST_FLUSH_SECONDS si alguien sigue el trabajo
+    en directo), solapando la subida con el enriquecimiento del resto.
+    """
+    token = current_source.set(source.name)
+    try:
+        with stage("ingest"):
+            collected = await source.collect(ctx)
+            if collected is None:
+                print(f"Sin cambios en {source.label} desde la última ejecución")
+                return 0
+            # Descartar los ya almacenados antes de gastar llamadas al LLM
+            with stage("dedup", items=len(collected.items)):
+                items = await drop_known_items(collected.items, ctx)
+            ARTICLES.inc(len(collected.items), source=source.name, outcome="fetched")
+            ARTICLES.inc(len(collected.items) - len(items), source=source.name, outcome="duplicate")
+            uploads = []
+            batch: list[dict] = []
+
+            def flush() -> None:
+                nonlocal batch
+                if batch:
+                    uploads.append(asyncio.create_task(_upload_batch(batch, ctx)))
+                batch = []
+
+            def on_row(row: dict) -> None:
+                batch.append(row)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    flush()
+
+            async def flush_periodically() -> None:
+                # Con alguien siguiendo el trabajo, sube lo pendiente aunque no lleguen más filas
+                # (p. ej. mientras otro artículo reintenta el LLM); si no, solo por tamaño de lote,
+                # para no insertar e invalidar la caché de respuestas cada pocos segundos
+                while True:
+                    await asyncio.sleep(INGEST_FLUSH_SECONDS)
+                    if ctx.watched is not None and ctx.watched():
+                        flush()
+
+            timer = asyncio.create_task(flush_periodically())
+            try:
+                await enrich_items(items, ctx, on_row=on_row)
+            finally:
+                timer.cancel()
+            flush()
+            results = await asyncio.gather(*uploads, return_exceptions=True)
+            added = sum(result for result in results if isinstance(result, int))
+            failed = [result for result in results if isinstance(result, BaseException)]
+            if failed:
+                # Sin on_success: el feed o la marca de arXiv no avanzan y la próxima ejecución lo reintenta
+                raise RuntimeError(
+                    f"Fallaron {len(failed)} de {len(results)} lotes de {source.label} ({added} insertados)"
+                ) from failed[0]
+            if collected.on_success is not None:
+                collected.on_success()
+            print(f"✓ Insertados {added} de {len(items)} {source.label}")
+            return added
+    finally:
+        current_source.reset(token)
+
+
+def entry_date(entry) -> str:
+    """
+    Fecha (YYYY-MM-DD) de una entrada de feed a partir de la fecha ya parseada por feedparser.
+    """
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    return time.strftime("%Y-%m-%d", parsed) if parsed else date.today().isoformat()
+
+
+def rss_source(name: str, label: str, feeds: dict[str, str], max_entries: int = 5,
+               check_source: str | None = None) -> Source:
+    """
+    Crea una fuente a partir de feeds RSS/Atom ({valor de source: URL}). Los feeds se descargan
+    a la vez con peticiones condicionales y solo se procesan los que han cambiado.
+    """
+    async def fetch(ctx: Deps, url: str) -> FeedFetch:
+        try:
+            return await fetch_feed_if_changed(ctx, url)
+        except Exception as e:
+            print(f"Error al descargar el feed {url}: {e}")
+            return FeedFetch(url=url, status="error")
+
+    async def collect(ctx: Deps) -> Collected | None:
+        fetched = await asyncio.gather(*(fetch(ctx, url) for url in feeds.values()))
+        if fetched and all(result.status == "error" for result in fetched):
+            # Que una caída total no parezca una ejecución sin cambios: el trabajo falla
+            raise RuntimeError(f"No se ha podido descargar ningún feed de {label}")
+        changed = [result for result in fetched if result.changed]
+        if not changed:
+            return None
+        items = []
+        for feed_source, result in zip(feeds, fetched):
+            if not result.changed:
+                continue
+            for entry in result.feed.entries[:max_entries]:
+                items.append({
+                    "source": feed_source,
+                    "title": entry.get("title", "Sin título"),
+                    "url": entry.get("link"),
+                    "date": entry_date(entry),
+                    # Dependiendo del feed, la descripción puede llamarse summary o description
+                    "text": entry.get("summary") or entry.get("description", ""),
+                })
+
+        def save() -> None:
+            for result in changed:
+                result.save()
+
+        return Collected(items=items, on_success=save)
+
+    return Source(name=name, label=label, check_source=check_source or next(iter(feeds)), collect=collect)
@@ -4,31 +4,61 @@ import os
 # Agregar el directorio padre al path para permitir importaciones relativas
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_search import YoutubeSearch
-from agent.summarizer import summarize
-from agent.classifier import classify
-from db.supabase_client import SupabaseClient
-from shared_definitions import Deps, upload_data
+from db.storage import close_store
+from metrics import instrument_client, stage
+from scraper.sources import Collected, Source, register_source, run_source
+from shared_definitions import Deps
 from httpx import AsyncClient
 from dotenv import load_dotenv
 from datetime import date
-import logfire
 import asyncio
 
 load_dotenv()
 
-async def scrape_youtube(ctx: Deps)-> int:
+YOUTUBE_SEARCH_URL = "https://www.youtube.com/results"
+# youtube_search reintenta sin límite cuando la página no trae resultados; aquí se acota
+YOUTUBE_SEARCH_ATTEMPTS = 3
+
+
+def parse_search_results(html: str, max_results: int) -> list[dict]:
+    """
+    Extrae los videos del HTML de resultados con el parser de youtube_search.
+    Se crea la instancia sin __init__ porque este lanzaría su propia petición bloqueante.
+    youtube_search (y requests) se importan aquí: el módulo se carga como plugin en cualquier
+    proceso que lea sources.toml.
+    """
+    from youtube_search import YoutubeSearch
+    parser = YoutubeSearch.__new__(YoutubeSearch)
+    return parser._parse_html(html)[:max_results]
+
+
+async def search_youtube(ctx: Deps, query: str, max_results: int) -> list[dict]:
+    """
+    Descarga la página de resultados con el cliente HTTP asíncrono compartido y la
+    parsea en un hilo, para no bloquear el bucle de eventos.
+    """
+    for _ in range(YOUTUBE_SEARCH_ATTEMPTS):
+        with stage("fetch", url=YOUTUBE_SEARCH_URL):
+            response = await ctx.client.get(YOUTUBE_SEARCH_URL, params={"search_query": query}, follow_redirects=True)
+        response.raise_for_status()
+        if "ytInitialData" in response.text:
+            with stage("parse", url=YOUTUBE_SEARCH_URL):
+                return await asyncio.to_thread(parse_search_results, response.text, max_results)
+    print("YouTube no ha devuelto resultados de búsqueda")
+    return []
+
+
+async def collect_youtube(ctx: Deps) -> Collected:
     """
-    Busca videos de YouTube con la palabra clave 'Inteligencia Artificial',
-    resume su contenido y los clasifica.
+    Busca videos de YouTube con la palabra clave 'Inteligencia Artificial'.
     """
-    client = SupabaseClient()
     query = "Inteligencia Artificial"
     max_results = 5
     # Realizar búsqueda en YouTube (sin API oficial)
-    results = YoutubeSearch(query, max_results=max_results).to_dict()
-    print(results)
-    añadidos=0
+    results = await search_youtube(ctx, query, max_results)
+    #Get current date
+    current_date = str(date.today().isoformat())
+    items = []
     for res in results:
         title = res.get('title', 'Sin título') # type: ignore
         # Construir URL completo del video
@@ -36,32 +66,33 @@ async def scrape_youtube(ctx: Deps)-> int:
         # Tomar la descripción o canal como texto base (si está disponible)
         snippet = res.get('long_desc', '') or title # type: ignore
         text_to_summarize = snippet if snippet else title
-        print('Texto a resumir:', text_to_summarize)
-        summary = await summarize(text_to_summarize, ctx) # type: ignore
-        print(f"Resumen generado: {summary}")
-        category = await classify(text_to_summarize, ctx) # type: ignore
-        #Get current date
-        current_date = str(date.today().isoformat())
-        data = {
+        items.append({
             "source": "YouTube",
             "title": title,
-            "summary": summary,
-            "category": category,
             "url": url,
-            "date": current_date
-        }
-        if upload_data(data):
-            print(f"✓ Insertado correctamente: {title[:30]}...") # type: ignore
-            añadidos += 1
-        else:
-            print(f"✗ No insertado (posible duplicado): {title[:30]}...") # type: ignore
-    return añadidos
+            "date": current_date,
+            "text": text_to_summarize,
+        })
+    return Collected(items=items)
+
+
+SOURCE = register_source(Source(name="youtube", label="videos de YouTube", check_source="YouTube", collect=collect_youtube))
+
+
+async def scrape_youtube(ctx: Deps)-> int:
+    """
+    Busca videos de YouTube sobre IA, resume su contenido y los clasifica.
+    """
+    return await run_source(SOURCE, ctx)
 
 async def main():
     async with AsyncClient() as client:
-        logfire.instrument_httpx(client, capture_all=True)
+        instrument_client(client)
         deps = Deps(client=client)
-        await scrape_youtube(ctx=deps)
+        try:
+            await scrape_youtube(ctx=deps)
+        finally:
+            await close_store()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,47 +1,113 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from httpx import AsyncClient
-from db.supabase_client import SupabaseClient
-from supabase import create_client, Client
-import os
+from db.near_duplicates import commit_signatures
+from db.search import mirror_articles
+from db.storage import get_store, normalize_title
+from response_cache import invalidate_responses
+import asyncio
+import time
+from typing import Callable
 
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),  # type: ignore
-    os.getenv("SUPABASE_KEY")  # type: ignore
-    )
+@dataclass
+class RunStats:
+    """
+    Contadores de una ejecución de scraper, devueltos en las respuestas de los endpoints.
+    """
+    fetched: int = 0
+    skipped_duplicates: int = 0
+    near_duplicates: int = 0  # misma noticia que otro artículo, agrupados sin enriquecer
+    enriched: int = 0
+    degraded: int = 0  # guardados con resumen provisional (LLM no disponible), pendientes de re-enriquecer
+    inserted: int = 0
+    # Tokens: estimación local de la entrada y consumo real que informa el modelo
+    estimated_tokens: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    chunked: int = 0  # artículos resumidos por fragmentos (map-reduce)
 
 @dataclass
 class Deps:
     client: AsyncClient
+    stats: RunStats = field(default_factory=RunStats)
+    # Se llama con las filas recién insertadas (p. ej. para emitirlas en /jobs/{id}/events)
+    on_inserted: Callable[[list[dict]], None] | None = None
+    # Indica si alguien sigue la ejecución en directo (/jobs/{id}/events)
+    watched: Callable[[], bool] | None = None
+
+class RateLimiter:
+    """
+    Garantiza un intervalo mínimo (en segundos) entre llamadas sucesivas a `wait()`.
+    Se comparte entre corrutinas, por lo que sirve como limitador por proveedor o por host.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self.interval
+
+# Número máximo de títulos por consulta de duplicados (para no exceder la longitud de URL)
+KEY_LOOKUP_CHUNK = 100
+
+async def known_articles(items: list[dict]) -> tuple[set[tuple[str, str]], set[str]]:
+    """
+    Carga de una vez las claves ya almacenadas que coinciden con `items`: pares
+    (source, título normalizado) y URLs. Una consulta por cada bloque de KEY_LOOKUP_CHUNK artículos,
+    que busca por la columna title_key, de modo que un título guardado con otras mayúsculas o
+    espacios también cuenta como conocido.
+    """
+    sources = sorted({item.get("source", "") for item in items})
+    known_titles: set[tuple[str, str]] = set()
+    known_urls: set[str] = set()
+    for start in range(0, len(items), KEY_LOOKUP_CHUNK):
+        chunk = items[start:start + KEY_LOOKUP_CHUNK]
+        titles = sorted({normalize_title(item.get("title", "")) for item in chunk})
+        urls = sorted({item.get("url", "") for item in chunk if item.get("url")})
+        try:
+            data = await get_store().find_articles(sources, titles, urls)
+        except Exception as e:
+            print(f"Error al cargar artículos conocidos: {e}")
+            continue
+        for row in data:
+            known_titles.add((row["source"], normalize_title(row["title"])))
+            if row.get("url"):
+                known_urls.add(row["url"])
+    return known_titles, known_urls
+
+async def upload_rows(rows: list[dict]) -> list[dict]:
+    """
+    Sube los artículos en una única inserción y devuelve las filas insertadas tal como quedan
+    en la base de datos. Los duplicados ya se descartan antes del enriquecimiento
+    (known_articles); la clave única (source, title) resuelve las carreras entre ejecuciones
+    simultáneas y las repeticiones dentro del lote.
+    """
+    new_rows = []
+    seen: set[tuple[str, str]] = set()
+    for row in rows:
+        key = (row.get("source", ""), row.get("title", ""))
+        if key not in seen:
+            seen.add(key)
+            new_rows.append(row)
+    if not new_rows:
+        return []
 
-def check_same_articles(source: str, title: str) -> bool:
-    client = SupabaseClient()
-    try:
-        response = supabase.table("articles").select('id').eq("source", source).eq("title", title).execute()
-        return len(getattr(response, 'data', [])) > 0
-    except Exception as e:
-        print(f"Error al verificar artículos similares para {source} y título {title}: {e}")
-        return False
-    
-def upload_data(data: dict) -> bool:
-    """
-    Sube un artículo a la base de datos si no existe ya un artículo con el mismo título y fuente.
-    """
-    client = SupabaseClient()
-    source = data.get("source", "")
-    title = data.get("title", "")
-    
-    if check_same_articles(source, title):
-        print(f"Artículo ya existe en la base de datos: {title}")
-        return False
-    
     try:
-        res_db = client.insert("articles", data)
-        if res_db.status_code != 201:
-            print(f"Error al insertar artículo en Supabase: {res_db.text}")
-            return False
-        else:
-            print(f"Artículo insertado: {title}")
-            return True
+        inserted = await get_store().insert_articles(new_rows)
+        mirror_articles(inserted)
+        commit_signatures(inserted)
+        if inserted:
+            # El dashboard y los listados en caché dejan de ser válidos
+            await invalidate_responses()
+        for item in inserted:
+            print(f"Artículo insertado: {item.get('title', '')}")
+        return inserted
     except Exception as e:
-        print(f"Error al subir artículo a Supabase: {e}")
-        return False
\ No newline at end of file
+        # Se propaga: la ingesta no debe dar por procesados (on_success) artículos que no se han guardado
+        print(f"Error al subir artículos a la base de datos: {e}")
+        raise
@@ -0,0 +1,10 @@
+# tests/conftest.py: Entorno de los tests: almacenamiento y cachés locales en memoria, sin Supabase ni Gemini.
+import os
+
+for name in ("SQLITE_DB_PATH", "SEARCH_INDEX_PATH", "NEAR_DUP_INDEX_PATH", "LLM_CACHE_PATH",
+             "FEED_CACHE_PATH", "REENRICH_QUEUE_PATH"):
+    os.environ.setdefault(name, ":memory:")
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LOGFIRE_SEND_TO_LOGFIRE", "false")
+os.environ.setdefault("LOGFIRE_IGNORE_NO_CONFIG", "1")
@@ -0,0 +1,83 @@
+# tests/test_gateway.py: Circuit breaker de agent/gateway.py con llamadas concurrentes.
+import asyncio
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+import agent.gateway as gateway
+from agent.gateway import CircuitBreaker, LLMUnavailable, run_agent
+from shared_definitions import Deps, RateLimiter
+
+COOLDOWN = 0.05
+
+
+def test_call_admitted_while_closed_does_not_release_probe(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=COOLDOWN)
+    # Respuesta de cada llamada según su prompt: un futuro que el test resuelve cuando quiere
+    replies: dict[str, asyncio.Future] = {}
+    started: dict[str, asyncio.Event] = {}
+
+    async def respond(messages, info) -> ModelResponse:
+        prompt = messages[-1].parts[-1].content
+        started[prompt].set()
+        outcome = await replies[prompt]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return ModelResponse(parts=[TextPart(outcome)])
+
+    model = FunctionModel(respond)
+    monkeypatch.setattr(gateway, "get_breaker", lambda model_name: breaker)
+    monkeypatch.setattr(gateway, "get_model", lambda model_name: model)
+    monkeypatch.setattr(gateway, "get_rate_limiter", lambda: RateLimiter(0))
+    monkeypatch.setattr(gateway, "LLM_RETRIES", 0)
+    monkeypatch.setattr(gateway, "FALLBACK_MODEL_NAME", "")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        for prompt in ("slow", "failing", "probe"):
+            replies[prompt] = loop.create_future()
+            started[prompt] = asyncio.Event()
+        agent = Agent()
+        ctx = Deps(client=None)
+        call = lambda prompt: asyncio.create_task(run_agent(agent, "test", prompt, ctx))
+
+        # Llamada admitida con el circuito cerrado que tarda en terminar
+        slow = call("slow")
+        await started["slow"].wait()
+        # Otra falla y abre el circuito (umbral 1)
+        failing = call("failing")
+        await started["failing"].wait()
+        replies["failing"].set_result(ModelHTTPError(503, "test"))
+        with pytest.raises(LLMUnavailable):
+            await failing
+        assert breaker.state == "open"
+
+        # Pasado el enfriamiento entra una única llamada de prueba
+        await asyncio.sleep(COOLDOWN)
+        probe = call("probe")
+        await started["probe"].wait()
+        assert breaker.state == "half_open"
+
+        # La lenta termina (con un error no transitorio) mientras la prueba sigue en curso
+        replies["slow"].set_result(ModelHTTPError(400, "test"))
+        with pytest.raises(ModelHTTPError):
+            await slow
+        assert breaker.allow() is None
+        with pytest.raises(LLMUnavailable):
+            await run_agent(agent, "test", "rejected", ctx)
+
+        replies["probe"].set_result("ok")
+        assert (await probe).output == "ok"
+        assert breaker.state == "closed"
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+
+def test_probe_failure_reopens_and_frees_next_probe():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow() == "probe"
+    assert breaker.allow() is None
+    breaker.record_failure(probe=True)
+    assert breaker.allow() == "probe"
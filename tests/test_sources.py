@@ -0,0 +1,43 @@
+# tests/test_sources.py: Ingesta de fuentes RSS (scraper/sources.py) cuando los feeds fallan.
+import asyncio
+import httpx
+import pytest
+from jobs import JobManager
+from scraper.feed_cache import get_feed_cache
+from scraper.sources import rss_source, run_source
+from shared_definitions import Deps
+
+FEEDS = {"Uno": "https://uno.test/feed", "Dos": "https://dos.test/feed"}
+
+
+def failing_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+
+
+def test_all_feeds_failing_raises():
+    source = rss_source("caida", "feeds caídos", FEEDS)
+
+    async def scenario():
+        async with failing_client() as client:
+            with pytest.raises(RuntimeError):
+                await run_source(source, Deps(client=client))
+
+    asyncio.run(scenario())
+    assert all(get_feed_cache().get(url) is None for url in FEEDS.values())
+
+
+def test_all_feeds_failing_fails_job():
+    source = rss_source("caida", "feeds caídos", FEEDS)
+
+    async def scenario():
+        manager = JobManager(workers=1)
+        manager.start()
+        async with failing_client() as client:
+            job, _ = manager.submit(source.name, lambda deps: run_source(source, Deps(client=client, stats=deps.stats)))
+            await job.wait()
+        await manager.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "failed"
+    assert job.added is None
@@ -0,0 +1,64 @@
+# tests/test_title_key.py: title_key de las filas antiguas (backfill) frente a normalize_title de known_articles.
+import asyncio
+import json
+import sqlite3
+from urllib.parse import parse_qs, urlparse
+import httpx
+from db.backfill_title_keys import backfill_title_keys
+from db.storage import SQLiteStore, normalize_title
+from db.supabase_client import SupabaseClient
+
+TITLES = [
+    "Die Straße der KI",
+    "Nuevo\u00a0modelo  de\u2009lenguaje",
+    "\tGemini\t2.5\n llega ",
+]
+# Cómo puede llegar el mismo título en una ejecución posterior
+VARIANTS = [
+    "DIE STRASSE DER KI",
+    "nuevo modelo de lenguaje",
+    "gemini 2.5 llega",
+]
+
+
+def test_variants_share_key():
+    assert [normalize_title(title) for title in TITLES] == [normalize_title(title) for title in VARIANTS]
+
+
+def test_sqlite_backfill_matches_normalize_title(tmp_path):
+    path = str(tmp_path / "articles.sqlite3")
+    # Fichero creado antes de la columna title_key
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY, source TEXT NOT NULL, title TEXT NOT NULL,"
+                 " summary TEXT, category TEXT, url TEXT, date TEXT)")
+    conn.executemany("INSERT INTO articles (source, title) VALUES ('s', ?)", [(title,) for title in TITLES])
+    conn.commit()
+    conn.close()
+
+    store = SQLiteStore(path)
+    keys = [row["title_key"] for row in store._query("SELECT title_key FROM articles ORDER BY id")]
+    assert keys == [normalize_title(title) for title in TITLES]
+    found = asyncio.run(store.find_articles(["s"], [normalize_title(title) for title in VARIANTS]))
+    assert sorted(row["title"] for row in found) == sorted(TITLES)
+
+
+def test_supabase_backfill_matches_normalize_title(monkeypatch):
+    monkeypatch.setenv("SUPABASE_URL", "https://supabase.test")
+    monkeypatch.setenv("SUPABASE_KEY", "test")
+    table = [{"id": index, "title": title, "title_key": None} for index, title in enumerate(TITLES, start=1)]
+
+    # PostgREST mínimo: GET ?title_key=is.null&limit=N y PATCH ?id=eq.N
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = {key: values[0] for key, values in parse_qs(urlparse(str(request.url)).query).items()}
+        if request.method == "GET":
+            pending = [{"id": row["id"], "title": row["title"]} for row in table if row["title_key"] is None]
+            return httpx.Response(200, json=pending[:int(params["limit"])])
+        row = next(row for row in table if f"eq.{row['id']}" == params["id"])
+        row.update(json.loads(request.content))
+        return httpx.Response(200, json=[row])
+
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="https://supabase.test/rest/v1")
+    updated = asyncio.run(backfill_title_keys(SupabaseClient(http_client), page_size=2))
+
+    assert updated == len(TITLES)
+    assert [row["title_key"] for row in table] == [normalize_title(title) for title in VARIANTS]